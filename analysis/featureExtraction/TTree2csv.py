@@ -1,13 +1,27 @@
-import ROOT
+import argparse
+import os
+import time
+import numpy as np
 
-# open the file
-f = ROOT.TFile.Open("kinematicFitAnalysisFiles/newVarspe/fittedPythia/BTag85SiD2024XCC/outputTreeBttHHbbbbESpreadDurham1034BSplitSampleN.root")
+try:
+    import uproot
+except ImportError:
+    uproot = None
 
-# get the tree
-t = f.Get("TreeBtt")
+DEFAULT_ROOT_FILE = "kinematicFitAnalysisFiles/newVarspe/fittedPythia/BTag85SiD2024XCC/outputTreeBttHHbbbbESpreadDurham1034BSplitSampleN.root"
+DEFAULT_TREE_NAME = "TreeBtt"
+DEFAULT_OUTPUT_FILE = "pyTorchAnalysis/Btt.csv"
 
-# create a csv file
-csv_file = open("pyTorchAnalysis/Btt.csv", "w")
+# number of events read per chunk; each chunk holds len(header_names) arrays of this length
+DEFAULT_CHUNK_SIZE = 500000
+
+# output formats and the extension appended to the output stem; the npy store is a
+# directory with one <branch>.npy file per column plus columns.txt with their order
+OUTPUT_EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'npy': '_npy'
+}
 
 # define header names (in the desired order) excluding the skipped branches
 header_names = [
@@ -76,18 +90,199 @@ header_names = [
     "jetPairMassDeltaFit"
 ]
 
-# write the header row to the CSV file
-csv_file.write(", ".join(header_names) + "\n")
-
-# loop over all events
-for i in range(t.GetEntries()):
-    t.GetEntry(i)
-    # retrieve the leaf values in the order defined by header_names
-    leaves = []
-    for name in header_names:
-        leaves.append(t.GetLeaf(name).GetValue())
-    # write line to csv file
-    csv_file.write(", ".join(map(str, leaves)) + "\n")
-
-# close the csv file
-csv_file.close()
+
+def iterate_branches(root_file, tree_name, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Read the requested branches of a TTree in chunks of NumPy arrays.
+    
+    Uses uproot when it is installed and falls back to ROOT's RDataFrame otherwise.
+    
+    Args:
+        root_file (str): Path to the ROOT file
+        tree_name (str): Name of the TTree inside the file
+        columns (list): Branch names to read
+        chunk_size (int): Number of events per chunk
+        
+    Yields:
+        dict: Branch name -> NumPy array for one chunk of events; an empty tree yields one
+              empty chunk, so the writers still see the branch dtypes
+    """
+    if uproot is not None:
+        with uproot.open(root_file) as f:
+            tree = f[tree_name]
+            if tree.num_entries == 0:
+                yield tree.arrays(columns, entry_stop=0, library="np")
+                return
+            for chunk in tree.iterate(columns, step_size=chunk_size, library="np"):
+                yield chunk
+        return
+    
+    import ROOT
+    
+    f = ROOT.TFile.Open(root_file)
+    t = f.Get(tree_name)
+    n_entries = t.GetEntries()
+    df = ROOT.RDataFrame(t)
+    if n_entries == 0:
+        yield df.AsNumpy(columns=columns)
+    for start in range(0, n_entries, chunk_size):
+        stop = min(start + chunk_size, n_entries)
+        yield df.Range(start, stop).AsNumpy(columns=columns)
+    f.Close()
+
+def count_entries(root_file, tree_name):
+    if uproot is not None:
+        with uproot.open(root_file) as f:
+            return f[tree_name].num_entries
+    
+    import ROOT
+    
+    f = ROOT.TFile.Open(root_file)
+    n_entries = f.Get(tree_name).GetEntries()
+    f.Close()
+    return n_entries
+
+def _csv_format(dtype):
+    # shortest formats that round-trip the stored precision
+    if np.issubdtype(dtype, np.integer) or np.issubdtype(dtype, np.bool_):
+        return '%d'
+    if dtype == np.float32:
+        return '%.9g'
+    return '%.17g'
+
+class CsvWriter:
+    """Writes chunks to a CSV file with the same ", " separated layout as the per-event loop."""
+    
+    def __init__(self, path, columns):
+        self.columns = columns
+        self.file = open(path, "w")
+        self.file.write(", ".join(columns) + "\n")
+    
+    def write(self, chunk):
+        fmt = [_csv_format(chunk[name].dtype) for name in self.columns]
+        table = np.column_stack([chunk[name] for name in self.columns])
+        np.savetxt(self.file, table, fmt=fmt, delimiter=", ")
+    
+    def close(self):
+        self.file.close()
+
+class ParquetWriter:
+    """Writes each chunk as one Parquet row group, keeping the branch dtypes."""
+    
+    def __init__(self, path, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.columns = columns
+        self.writer = None
+    
+    def write(self, chunk):
+        table = self.pa.table({name: chunk[name] for name in self.columns})
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+    
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+class NpyWriter:
+    """Writes every branch into its own memory-mapped .npy file inside a store directory."""
+    
+    def __init__(self, path, columns, n_entries):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.columns = columns
+        self.n_entries = n_entries
+        self.arrays = None
+        self.offset = 0
+        with open(os.path.join(path, "columns.txt"), "w") as f:
+            f.write("\n".join(columns) + "\n")
+    
+    def write(self, chunk):
+        if self.arrays is None:
+            self.arrays = {
+                name: np.lib.format.open_memmap(
+                    os.path.join(self.path, f"{name}.npy"), mode="w+",
+                    dtype=chunk[name].dtype, shape=(self.n_entries,)
+                )
+                for name in self.columns
+            }
+        n = len(chunk[self.columns[0]])
+        for name in self.columns:
+            self.arrays[name][self.offset:self.offset + n] = chunk[name]
+        self.offset += n
+    
+    def close(self):
+        if self.arrays is not None:
+            for array in self.arrays.values():
+                array.flush()
+
+def output_path(output_file, output_format):
+    stem = os.path.splitext(output_file)[0]
+    return stem + OUTPUT_EXTENSIONS[output_format]
+
+def convert_tree(root_file, tree_name, output_file, output_format='csv',
+                 chunk_size=DEFAULT_CHUNK_SIZE, columns=None):
+    """
+    Convert the listed branches of a TTree into a feature table.
+    
+    Args:
+        root_file (str): Path to the ROOT file
+        tree_name (str): Name of the TTree inside the file
+        output_file (str): Output path; its extension is replaced to match output_format
+        output_format (str): One of 'csv', 'parquet' or 'npy'
+        chunk_size (int): Number of events read and written per chunk
+        columns (list): Branches to export, defaults to header_names
+        
+    Returns:
+        tuple: (output path, number of events written)
+    """
+    columns = columns or header_names
+    path = output_path(output_file, output_format)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    
+    if output_format == 'csv':
+        writer = CsvWriter(path, columns)
+    elif output_format == 'parquet':
+        writer = ParquetWriter(path, columns)
+    elif output_format == 'npy':
+        writer = NpyWriter(path, columns, count_entries(root_file, tree_name))
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
+    
+    n_events = 0
+    try:
+        for chunk in iterate_branches(root_file, tree_name, columns, chunk_size):
+            writer.write(chunk)
+            n_events += len(chunk[columns[0]])
+    finally:
+        writer.close()
+    
+    return path, n_events
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Export the feature branches of a TTree to a CSV or binary columnar table')
+    parser.add_argument('--input', type=str, default=DEFAULT_ROOT_FILE,
+                        help='Input ROOT file')
+    parser.add_argument('--tree', type=str, default=DEFAULT_TREE_NAME,
+                        help=f'Name of the TTree (default: {DEFAULT_TREE_NAME})')
+    parser.add_argument('--output', type=str, default=DEFAULT_OUTPUT_FILE,
+                        help=f'Output file (default: {DEFAULT_OUTPUT_FILE})')
+    parser.add_argument('--format', type=str, default='csv', choices=sorted(OUTPUT_EXTENSIONS),
+                        help='Output format (default: csv)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Events read per chunk (default: {DEFAULT_CHUNK_SIZE})')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    
+    start_time = time.time()
+    path, n_events = convert_tree(args.input, args.tree, args.output, args.format, args.chunk_size)
+    elapsed = time.time() - start_time
+    
+    print(f"Wrote {n_events} events from {args.tree} to {path} in {elapsed:.1f}s")
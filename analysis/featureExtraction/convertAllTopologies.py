@@ -0,0 +1,133 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from TTree2csv import convert_tree, DEFAULT_CHUNK_SIZE, OUTPUT_EXTENSIONS
+
+# topologies expected by BDTGs.main: signal.csv plus one file per background
+TOPOLOGIES = [
+    "signal",
+    "Bqq", "Btt", "BZZ", "BWW",
+    "BqqX", "BqqqqX", "BqqHX", "BZH",
+    "Bpebb", "Bpebbqq", "BpeqqH", "Bpett"
+]
+
+def load_manifest(manifest_file):
+    """
+    Read the conversion manifest.
+
+    The manifest is a JSON object mapping each topology name to its input and output, e.g.
+    {"Btt": {"root_file": "outputTreeBtt....root", "tree": "TreeBtt", "output": "pyTorchAnalysis/Btt.csv"}}
+
+    Args:
+        manifest_file (str): Path to the JSON manifest
+
+    Returns:
+        dict: Topology name -> {'root_file', 'tree', 'output'}
+    """
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+
+    for name, entry in manifest.items():
+        missing_keys = [key for key in ('root_file', 'tree', 'output') if key not in entry]
+        if missing_keys:
+            raise ValueError(f"Manifest entry {name} is missing {', '.join(missing_keys)}")
+
+    missing_topologies = [name for name in TOPOLOGIES if name not in manifest]
+    if missing_topologies:
+        print(f"Warning: manifest has no entry for {', '.join(missing_topologies)}")
+
+    return manifest
+
+def _path_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return os.path.getsize(path)
+
+def convert_topology(name, root_file, tree, output, output_format, chunk_size):
+    start_time = time.time()
+    path, n_events = convert_tree(root_file, tree, output, output_format, chunk_size)
+    elapsed = time.time() - start_time
+
+    return {
+        'name': name,
+        'output': path,
+        'events': n_events,
+        'seconds': elapsed,
+        'input_mb': _path_size(root_file) / 1e6,
+        'output_mb': _path_size(path) / 1e6
+    }
+
+def convert_all(manifest, output_format='csv', workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Convert every topology of the manifest concurrently in a process pool.
+
+    The largest input files are submitted first so the stage finishes in about
+    the time needed for the largest file.
+
+    Returns:
+        list: Per-topology throughput reports
+    """
+    workers = workers or min(len(manifest), multiprocessing.cpu_count())
+
+    order = sorted(manifest, key=lambda name: _path_size(manifest[name]['root_file']), reverse=True)
+
+    print(f"Converting {len(order)} topologies with {workers} workers...")
+    reports = []
+
+    # spawn keeps ROOT state out of the forked workers
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(
+                convert_topology, name,
+                manifest[name]['root_file'], manifest[name]['tree'], manifest[name]['output'],
+                output_format, chunk_size
+            ): name
+            for name in order
+        }
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                print(f"  {name}: conversion failed: {e}")
+                continue
+
+            seconds = max(report['seconds'], 1e-9)
+            print(f"  {name}: {report['events']} events in {report['seconds']:.1f}s "
+                  f"({report['events']/seconds:.0f} events/s, "
+                  f"{report['input_mb']/seconds:.1f} MB/s read, "
+                  f"{report['output_mb']/seconds:.1f} MB/s written) -> {report['output']}")
+            reports.append(report)
+
+    return reports
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Convert the TTrees of all topologies to feature tables in parallel')
+    parser.add_argument('--manifest', type=str, required=True,
+                        help='JSON manifest mapping topology -> {root_file, tree, output}')
+    parser.add_argument('--format', type=str, default='csv', choices=sorted(OUTPUT_EXTENSIONS),
+                        help='Output format (default: csv)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: one per topology, up to the number of cores)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Events read per chunk (default: {DEFAULT_CHUNK_SIZE})')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    start_time = time.time()
+    manifest = load_manifest(args.manifest)
+    reports = convert_all(manifest, args.format, args.workers, args.chunk_size)
+    elapsed = time.time() - start_time
+
+    total_events = sum(report['events'] for report in reports)
+    total_mb = sum(report['input_mb'] for report in reports)
+    print(f"\nConverted {len(reports)}/{len(manifest)} topologies, {total_events} events "
+          f"({total_mb:.1f} MB) in {elapsed:.1f}s")
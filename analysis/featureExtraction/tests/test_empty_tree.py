@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+uproot = pytest.importorskip("uproot")
+
+from TTree2csv import convert_tree, header_names
+from convertAllTopologies import convert_topology
+
+COLUMNS = ['aplanarity', 'jetNObjects']
+
+@pytest.fixture
+def empty_tree(tmp_path):
+    root_file = str(tmp_path / 'empty.root')
+    with uproot.recreate(root_file) as f:
+        f['T'] = {name: np.zeros(0, dtype=np.int32 if name == 'jetNObjects' else np.float32)
+                  for name in header_names}
+    return root_file
+
+@pytest.mark.parametrize('output_format', ['csv', 'parquet', 'npy'])
+def test_empty_tree_writes_an_empty_typed_table(empty_tree, tmp_path, output_format):
+    path, n_events = convert_tree(empty_tree, 'T', str(tmp_path / 'out' / 'empty.csv'), output_format,
+                                  columns=COLUMNS)
+    assert n_events == 0
+    assert os.path.exists(path)
+
+    if output_format == 'csv':
+        df = pd.read_csv(path, skipinitialspace=True)
+        assert list(df.columns) == COLUMNS and len(df) == 0
+    elif output_format == 'parquet':
+        df = pd.read_parquet(path)
+        assert list(df.columns) == COLUMNS and len(df) == 0
+        assert df['aplanarity'].dtype == np.float32 and df['jetNObjects'].dtype == np.int32
+    else:
+        for name, dtype in zip(COLUMNS, (np.float32, np.int32)):
+            array = np.load(os.path.join(path, f'{name}.npy'))
+            assert array.shape == (0,) and array.dtype == dtype
+
+@pytest.mark.parametrize('output_format', ['csv', 'parquet', 'npy'])
+def test_convert_topology_reports_an_empty_tree(empty_tree, tmp_path, output_format):
+    report = convert_topology('empty', empty_tree, 'T', str(tmp_path / 'empty.csv'), output_format, 1000)
+    assert report['events'] == 0
+    assert report['output_mb'] >= 0
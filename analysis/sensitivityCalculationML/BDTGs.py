@@ -9,10 +9,23 @@ import matplotlib.pyplot as plt
 from tqdm import tqdm
 import argparse
 import sys
+import multiprocessing
 import subprocess
+import hashlib
+import inspect
+import json
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 np.random.seed(42)
 
+# default location of the saved models, see train_bdtg_models
+DEFAULT_REGISTRY_DIR = 'model_registry'
+
+# binary columnar stores written by TTree2csv.py, checked in this order before the CSV file
+FEATURE_STORE_EXTENSIONS = ['.parquet', '_npy']
+
 def get_excluded_variables():
     """
     Define which variables should be excluded from the analysis.
@@ -65,18 +78,114 @@ def apply_variable_transformations(df):
     
     return df
 
-def load_data(signal_file, background_files, test_size=0.25):
+def find_feature_store(csv_file):
+    """
+    Find the binary columnar store written next to a topology's CSV file.
+    
+    TTree2csv.py writes <name>.parquet or a <name>_npy directory with one .npy file per column.
+    
+    Args:
+        csv_file (str): Path of the topology's CSV file, e.g. Btt.csv
+        
+    Returns:
+        str: Path of the store, or None if only the CSV exists
+    """
+    stem = os.path.splitext(csv_file)[0]
+    for extension in FEATURE_STORE_EXTENSIONS:
+        if os.path.exists(stem + extension):
+            return stem + extension
+    return None
+
+def read_feature_table(csv_file, excluded_vars):
+    """
+    Read a topology's features, skipping the excluded variables.
+    
+    Reads only the needed columns, with their stored dtypes, from the binary store
+    when one exists and falls back to parsing the CSV file otherwise.
+    
+    Args:
+        csv_file (str): Path of the topology's CSV file
+        excluded_vars (list): Variables that should not be read
+        
+    Returns:
+        tuple: (DataFrame with the remaining variables, list of excluded variables present in the file)
+    """
+    store = find_feature_store(csv_file)
+    
+    if store is None:
+        if not os.path.exists(csv_file):
+            raise FileNotFoundError(csv_file)
+        all_columns = pd.read_csv(csv_file, skipinitialspace=True, nrows=0).columns
+        excluded_present = [var for var in excluded_vars if var in all_columns]
+        data = pd.read_csv(csv_file, skipinitialspace=True,
+                           usecols=[col for col in all_columns if col not in excluded_vars])
+        return data, excluded_present
+    
+    if store.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        all_columns = pq.ParquetFile(store).schema_arrow.names
+        columns = [col for col in all_columns if col not in excluded_vars]
+        data = pd.read_parquet(store, columns=columns)
+    else:
+        with open(os.path.join(store, 'columns.txt')) as f:
+            all_columns = [line.strip() for line in f if line.strip()]
+        columns = [col for col in all_columns if col not in excluded_vars]
+        data = pd.DataFrame({col: np.load(os.path.join(store, f'{col}.npy')) for col in columns})
+    
+    print(f"  Read {os.path.basename(store)} ({len(columns)} of {len(all_columns)} columns)")
+    excluded_present = [var for var in excluded_vars if var in all_columns]
+    return data, excluded_present
+
+class SplitExporter:
+    """
+    Writes the train/test splits to disk from a background thread.
+    
+    Exporting is optional: the splits are only needed to inspect or reuse the
+    samples outside this script, training works on the in-memory copies.
+    
+    Args:
+        output_format (str): 'csv' or 'parquet'
+        output_dir (str): Directory the files are written to
+    """
+    
+    def __init__(self, output_format='csv', output_dir='.'):
+        if output_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unknown export format: {output_format}")
+        self.output_format = output_format
+        self.output_dir = output_dir
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.futures = []
+    
+    def _write(self, df, name):
+        path = os.path.join(self.output_dir, f'{name}.{self.output_format}')
+        if self.output_format == 'parquet':
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+        return path
+    
+    def submit(self, df, name):
+        self.futures.append(self.executor.submit(self._write, df, name))
+    
+    def close(self):
+        """Wait for all pending writes and report them."""
+        for future in self.futures:
+            try:
+                print(f"  Saved {future.result()}")
+            except Exception as e:
+                print(f"  Warning: failed to export split: {e}")
+        self.executor.shutdown()
+        self.futures = []
+
+def load_data(signal_file, background_files, test_size=0.25, exporter=None):
     # Get list of variables to exclude from the analysis
     excluded_vars = get_excluded_variables()
     
-    # Load signal data from CSV file
-    signal_data = pd.read_csv(signal_file)
+    # Load signal data, excluded variables are never read
+    signal_data, excluded_vars_present = read_feature_table(signal_file, excluded_vars)
     
-    # Remove excluded variables from signal data
-    excluded_vars_present = [var for var in excluded_vars if var in signal_data.columns]
     if excluded_vars_present:
         print(f"\nExcluding variables from analysis: {', '.join(excluded_vars_present)}")
-        signal_data = signal_data.drop(columns=excluded_vars_present)
     
     # Apply variable transformations to signal data
     signal_data = apply_variable_transformations(signal_data)
@@ -96,10 +205,9 @@ def load_data(signal_file, background_files, test_size=0.25):
     print(f"  Signal events for training: {len(signal_train)}")
     print(f"  Signal events for testing: {len(signal_test)}")
     
-    signal_train.to_csv('signal_train.csv', index=False)
-    signal_test.to_csv('signal_test.csv', index=False)
-    print(f"  Saved signal training events to signal_train.csv")
-    print(f"  Saved signal testing events to signal_test.csv")
+    if exporter is not None:
+        exporter.submit(signal_train, 'signal_train')
+        exporter.submit(signal_test, 'signal_test')
     
     background_dfs = {}
     
@@ -107,12 +215,7 @@ def load_data(signal_file, background_files, test_size=0.25):
     for bg_file in background_files:
         bg_name = os.path.splitext(os.path.basename(bg_file))[0]
         try:
-            bg = pd.read_csv(bg_file)
-            
-            # Remove excluded variables from background data
-            excluded_vars_present_bg = [var for var in excluded_vars if var in bg.columns]
-            if excluded_vars_present_bg:
-                bg = bg.drop(columns=excluded_vars_present_bg)
+            bg, _ = read_feature_table(bg_file, excluded_vars)
             
             # Apply variable transformations to background data
             bg = apply_variable_transformations(bg)
@@ -132,10 +235,9 @@ def load_data(signal_file, background_files, test_size=0.25):
             bg_data, test_size=test_size, random_state=42
         )
         
-        bg_train.to_csv(f'{bg_name}_train.csv', index=False)
-        bg_test.to_csv(f'{bg_name}_test.csv', index=False)
-        print(f"  Saved {bg_name} training events to {bg_name}_train.csv")
-        print(f"  Saved {bg_name} testing events to {bg_name}_test.csv")
+        if exporter is not None:
+            exporter.submit(bg_train, f'{bg_name}_train')
+            exporter.submit(bg_test, f'{bg_name}_test')
         
         X_train = pd.concat([signal_train[feature_names], bg_train[feature_names]])
         y_train = pd.concat([signal_train['label'], bg_train['label']])
@@ -166,15 +268,14 @@ def load_data(signal_file, background_files, test_size=0.25):
             'feature_names': feature_names
         }
         
-        train_df = X_train.copy()
-        train_df['label'] = y_train.values
-        test_df = X_test.copy()
-        test_df['label'] = y_test.values
-        
-        train_df.to_csv(f'signal_vs_{bg_name}_train.csv', index=False)
-        test_df.to_csv(f'signal_vs_{bg_name}_test.csv', index=False)
-        print(f"  Saved combined signal vs {bg_name} training events to signal_vs_{bg_name}_train.csv")
-        print(f"  Saved combined signal vs {bg_name} testing events to signal_vs_{bg_name}_test.csv")
+        if exporter is not None:
+            train_df = X_train.copy()
+            train_df['label'] = y_train.values
+            test_df = X_test.copy()
+            test_df['label'] = y_test.values
+            
+            exporter.submit(train_df, f'signal_vs_{bg_name}_train')
+            exporter.submit(test_df, f'signal_vs_{bg_name}_test')
         
         print(f"\nDataset for {bg_name} vs Signal:")
         print(f"  Training: {len(X_train_scaled)} events ({len(signal_train)} signal, {len(bg_train)} background)")
@@ -183,122 +284,317 @@ def load_data(signal_file, background_files, test_size=0.25):
     return datasets, signal_test, {bg_name: train_test_split(bg, test_size=test_size, random_state=42)[1] 
                                   for bg_name, bg in background_dfs.items()}
 
-def train_bdtg_models(datasets, n_estimators=200, learning_rate=0.1, max_depth=5):
-    models = {}
+def train_single_model(bg_name, data, n_estimators=200, learning_rate=0.1, max_depth=5, n_jobs=-1):
+    """
+    Train the feature selector and the XGBoost classifier for one background vs signal.
     
-    print("\nTraining XGBoost models for each background type vs signal:")
-    for bg_name, data in tqdm(datasets.items(), desc="Background types"):
-        print(f"\n  Training XGBoost for {bg_name} vs Signal")
-        
-        X_train = data['X_train']
-        y_train = data['y_train']
-        X_test = data['X_test']
-        y_test = data['y_test']
-        
-        # for early stopping
-        X_train_main, X_valid, y_train_main, y_valid = train_test_split(
-            X_train, y_train, test_size=0.2, random_state=42
-        )
-        
-        feature_selector = xgb.XGBClassifier(
-            n_estimators=50,  # CHANGE??? fewer trees for feature selection
-            learning_rate=0.1,
-            max_depth=3,
-            random_state=42,
-            n_jobs=-1,
-            tree_method='hist',
-            subsample=0.8,  
-            colsample_bytree=0.8  
-        )
-        
-        feature_selector.fit(X_train_main, y_train_main)
-        
-        importances = feature_selector.feature_importances_
-        feature_names = X_train.columns.tolist()
-        
-        sorted_idx = np.argsort(importances)[::-1]
-        
-        cumulative_importance = 0
-        important_features = []
-        
-        for idx in sorted_idx:
-            important_features.append(feature_names[idx])
-            cumulative_importance += importances[idx]
-            if cumulative_importance >= 0.8:  
-                break
-        
-        print(f"  Selected {len(important_features)} out of {len(feature_names)} features")
-        
-        X_train_main_selected = X_train_main[important_features]
-        X_valid_selected = X_valid[important_features]
-        X_test_selected = X_test[important_features]
-        
-        try:
-            import cupy
-            gpu_available = True
-            tree_method = 'gpu_hist'
-            predictor = 'gpu_predictor'
-            print("  Using GPU acceleration")
-        except ImportError:
-            gpu_available = False
-            tree_method = 'hist'
-            predictor = 'auto'
-            print("  Using CPU (GPU not available)")
-        
-        scale_pos_weight = np.sum(y_train_main == 0) / np.sum(y_train_main == 1)
-        
-        model = xgb.XGBClassifier(
-            n_estimators=n_estimators,
-            learning_rate=learning_rate,
-            max_depth=max_depth,
-            min_child_weight=3,
-            gamma=0.1,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            colsample_bylevel=0.8,
-            colsample_bynode=0.8,
-            reg_alpha=0.01,
-            reg_lambda=1,
-            scale_pos_weight=scale_pos_weight,
-            random_state=42,
-            tree_method=tree_method,
-            predictor=predictor,
-            n_jobs=-1,
-            grow_policy='lossguide',
-            max_bin=256,
-            early_stopping_rounds=50,
-            eval_metric=['auc', 'logloss']
-        )
-        
-        # for early stopping
-        eval_set = [(X_train_main_selected, y_train_main), (X_valid_selected, y_valid)]
+    Args:
+        bg_name (str): Name of the background topology
+        data (dict): Entry of the datasets returned by load_data
+        n_jobs (int): Number of threads used by XGBoost (-1 for all cores)
         
-        print("  Training model with early stopping...")
-        model.fit(
-            X_train_main_selected, 
-            y_train_main,
-            eval_set=eval_set,
-            verbose=100  # Print progress every 100 iterations
-        )
+    Returns:
+        dict: {'model', 'auc', 'features'} for this background
+    """
+    print(f"\n  Training XGBoost for {bg_name} vs Signal")
+    
+    X_train = data['X_train']
+    y_train = data['y_train']
+    X_test = data['X_test']
+    y_test = data['y_test']
+    
+    # for early stopping
+    X_train_main, X_valid, y_train_main, y_valid = train_test_split(
+        X_train, y_train, test_size=0.2, random_state=42
+    )
+    
+    feature_selector = xgb.XGBClassifier(
+        n_estimators=50,  # CHANGE??? fewer trees for feature selection
+        learning_rate=0.1,
+        max_depth=3,
+        random_state=42,
+        n_jobs=n_jobs,
+        tree_method='hist',
+        subsample=0.8,  
+        colsample_bytree=0.8  
+    )
+    
+    feature_selector.fit(X_train_main, y_train_main)
+    
+    importances = feature_selector.feature_importances_
+    feature_names = X_train.columns.tolist()
+    
+    sorted_idx = np.argsort(importances)[::-1]
+    
+    cumulative_importance = 0
+    important_features = []
+    
+    for idx in sorted_idx:
+        important_features.append(feature_names[idx])
+        cumulative_importance += importances[idx]
+        if cumulative_importance >= 0.8:  
+            break
+    
+    print(f"  Selected {len(important_features)} out of {len(feature_names)} features")
+    
+    X_train_main_selected = X_train_main[important_features]
+    X_valid_selected = X_valid[important_features]
+    X_test_selected = X_test[important_features]
+    
+    try:
+        import cupy
+        gpu_available = True
+        tree_method = 'gpu_hist'
+        predictor = 'gpu_predictor'
+        print("  Using GPU acceleration")
+    except ImportError:
+        gpu_available = False
+        tree_method = 'hist'
+        predictor = 'auto'
+        print("  Using CPU (GPU not available)")
+    
+    scale_pos_weight = np.sum(y_train_main == 0) / np.sum(y_train_main == 1)
+    
+    model = xgb.XGBClassifier(
+        n_estimators=n_estimators,
+        learning_rate=learning_rate,
+        max_depth=max_depth,
+        min_child_weight=3,
+        gamma=0.1,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        colsample_bylevel=0.8,
+        colsample_bynode=0.8,
+        reg_alpha=0.01,
+        reg_lambda=1,
+        scale_pos_weight=scale_pos_weight,
+        random_state=42,
+        tree_method=tree_method,
+        predictor=predictor,
+        n_jobs=n_jobs,
+        grow_policy='lossguide',
+        max_bin=256,
+        early_stopping_rounds=50,
+        eval_metric=['auc', 'logloss']
+    )
+    
+    # for early stopping
+    eval_set = [(X_train_main_selected, y_train_main), (X_valid_selected, y_valid)]
+    
+    print("  Training model with early stopping...")
+    model.fit(
+        X_train_main_selected, 
+        y_train_main,
+        eval_set=eval_set,
+        verbose=100  # Print progress every 100 iterations
+    )
+    
+    best_iteration = model.best_iteration
+    if best_iteration is not None:
+        print(f"  Best iteration: {best_iteration}")
+    else:
+        print("  Early stopping not triggered, used all iterations")
+    
+    y_pred = model.predict_proba(X_test_selected)[:, 1]
+    auc = roc_auc_score(y_test, y_pred)
+    
+    print(f"  AUC for {bg_name}: {auc:.4f}")
+    
+    return {
+        'model': model,
+        'auc': auc,
+        'features': important_features
+    }
+
+def model_fingerprint(bg_name, data, hyperparameters):
+    """
+    Hash everything a trained model depends on: the training and test samples, the
+    hyperparameters, the training code and the XGBoost version.
+    
+    Returns:
+        str: Hex digest used as the registry key
+    """
+    h = hashlib.sha256()
+    h.update(bg_name.encode())
+    h.update(json.dumps(hyperparameters, sort_keys=True).encode())
+    h.update(xgb.__version__.encode())
+    h.update(inspect.getsource(train_single_model).encode())
+    for X, y in ((data['X_train'], data['y_train']), (data['X_test'], data['y_test'])):
+        h.update(','.join(X.columns).encode())
+        h.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+        h.update(np.ascontiguousarray(y).tobytes())
+    return h.hexdigest()[:20]
+
+def _registry_path(registry_dir, bg_name, key):
+    return os.path.join(registry_dir, f'{bg_name}_{key}')
+
+def load_registered_model(registry_dir, bg_name, key):
+    """
+    Load a model saved by save_registered_model.
+    
+    Returns:
+        dict: {'model', 'auc', 'features', 'scaler'}, or None if the key is not registered
+    """
+    path = _registry_path(registry_dir, bg_name, key)
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    
+    model = xgb.XGBClassifier()
+    model.load_model(os.path.join(path, 'model.json'))
+    
+    with open(os.path.join(path, 'scaler.pkl'), 'rb') as f:
+        scaler = pickle.load(f)
+    
+    return {
+        'model': model,
+        'auc': meta['auc'],
+        'features': meta['features'],
+        'scaler': scaler
+    }
+
+def save_registered_model(registry_dir, bg_name, key, model_info):
+    path = _registry_path(registry_dir, bg_name, key)
+    os.makedirs(path, exist_ok=True)
+    
+    model_info['model'].save_model(os.path.join(path, 'model.json'))
+    with open(os.path.join(path, 'scaler.pkl'), 'wb') as f:
+        pickle.dump(model_info['scaler'], f)
+    
+    # meta.json is written last, it marks the entry as complete
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({
+            'background': bg_name,
+            'key': key,
+            'auc': float(model_info['auc']),
+            'features': model_info['features'],
+            'created': time.strftime("%Y-%m-%d %H:%M:%S")
+        }, f, indent=2)
+
+def train_bdtg_models(datasets, n_estimators=200, learning_rate=0.1, max_depth=5,
+                      n_parallel=1, n_cores=None, registry_dir=None):
+    """
+    Train one XGBoost model per background type.
+    
+    With n_parallel > 1 the models are trained in that many worker processes at once and
+    the available cores are split between them (e.g. 64 cores, 8 models x 8 threads).
+    Every model is trained with the same seeds and data as in the sequential loop.
+    
+    With a registry_dir, each trained model is saved together with its scaler and selected
+    features under a fingerprint of its data and hyperparameters, and reloaded instead of
+    retrained when the fingerprint is already registered.
+    
+    Args:
+        datasets (dict): Datasets returned by load_data
+        n_parallel (int): Number of models trained concurrently
+        n_cores (int): Cores to split between the concurrent models (default: all)
+        registry_dir (str): Directory of the model registry (default: no registry)
         
+    Returns:
+        dict: Background name -> {'model', 'auc', 'features', 'scaler'}
+    """
+    models = {}
+    pending = dict(datasets)
+    keys = {}
+    
+    if registry_dir is not None:
+        hyperparameters = {
+            'n_estimators': n_estimators,
+            'learning_rate': learning_rate,
+            'max_depth': max_depth
+        }
+        for bg_name, data in datasets.items():
+            keys[bg_name] = model_fingerprint(bg_name, data, hyperparameters)
+            model_info = load_registered_model(registry_dir, bg_name, keys[bg_name])
+            if model_info is not None:
+                print(f"  Reusing registered model for {bg_name} (AUC {model_info['auc']:.4f})")
+                models[bg_name] = model_info
+                del pending[bg_name]
+    
+    trained = {}
+    
+    if pending and n_parallel > 1:
+        n_cores = n_cores or os.cpu_count()
+        threads_per_model = max(1, n_cores // n_parallel)
+        print(f"\nTraining XGBoost models for each background type vs signal "
+              f"({n_parallel} at once, {threads_per_model} threads each):")
+        
+        # spawn, a fork could copy the lock state of the running SplitExporter thread into the workers
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_parallel, mp_context=context) as executor:
+            futures = {
+                executor.submit(train_single_model, bg_name, data, n_estimators,
+                                learning_rate, max_depth, threads_per_model): bg_name
+                for bg_name, data in pending.items()
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Background types"):
+                trained[futures[future]] = future.result()
+    elif pending:
+        print("\nTraining XGBoost models for each background type vs signal:")
+        for bg_name, data in tqdm(pending.items(), desc="Background types"):
+            trained[bg_name] = train_single_model(bg_name, data, n_estimators, learning_rate, max_depth)
+    
+    for bg_name, model_info in trained.items():
+        model_info['scaler'] = datasets[bg_name]['scaler']
+        if registry_dir is not None:
+            save_registered_model(registry_dir, bg_name, keys[bg_name], model_info)
+        models[bg_name] = model_info
+    
+    # keep the background order of the datasets
+    return {bg_name: models[bg_name] for bg_name in datasets}
+
+
+def _iteration_range(model):
+    # same trees predict_proba uses: up to the best iteration when early stopping was triggered
+    try:
         best_iteration = model.best_iteration
-        if best_iteration is not None:
-            print(f"  Best iteration: {best_iteration}")
-        else:
-            print("  Early stopping not triggered, used all iterations")
+    except AttributeError:
+        best_iteration = None
+    if best_iteration is None:
+        return (0, 0)
+    return (0, best_iteration + 1)
+
+def predict_topology(models, scalers, feature_names, topology_df):
+    """
+    Compute the scores of every model for one event topology in a single pass.
+    
+    The events are converted once to a contiguous matrix (float32 for the binary feature stores,
+    float64 only if a column was parsed as float64 from CSV, so the scores match predict_proba).
+    Each model's feature selection is copied out of it and scaled in place, then handed to
+    XGBoost's multi-threaded in-place prediction, so no intermediate DataFrames are built.
+    
+    Args:
+        models (dict): Models returned by train_bdtg_models
+        scalers (dict): Background name -> fitted StandardScaler
+        feature_names (list): Feature order the scalers were fitted with
+        topology_df (DataFrame): Events of the topology
         
-        y_pred = model.predict_proba(X_test_selected)[:, 1]
-        auc = roc_auc_score(y_test, y_pred)
+    Returns:
+        DataFrame: One BDTG_<background> column per model
+    """
+    dtype = np.result_type(np.float32, *topology_df[feature_names].dtypes)
+    X = np.ascontiguousarray(topology_df[feature_names].to_numpy(dtype=dtype))
+    feature_index = {name: i for i, name in enumerate(feature_names)}
+    
+    scores = np.empty((len(X), len(models)), dtype=np.float32)
+    
+    for j, (bg_name, model_info) in enumerate(models.items()):
+        scaler = scalers[bg_name]
+        columns = [feature_index[name] for name in model_info['features']]
         
-        print(f"  AUC for {bg_name}: {auc:.4f}")
+        # same operations and precision as StandardScaler.transform
+        X_selected = X[:, columns]
+        X_selected -= scaler.mean_[columns].astype(X.dtype)
+        X_selected /= scaler.scale_[columns].astype(X.dtype)
         
-        models[bg_name] = {
-            'model': model,
-            'auc': auc,
-            'features': important_features
-        }
+        booster = model_info['model'].get_booster()
+        scores[:, j] = booster.inplace_predict(
+            X_selected, iteration_range=_iteration_range(model_info['model'])
+        )
     
-    return models
+    return pd.DataFrame(scores, columns=[f'BDTG_{bg_name}' for bg_name in models])
 
 def apply_models(models, datasets, signal_test, background_tests):
    
@@ -306,66 +602,19 @@ def apply_models(models, datasets, signal_test, background_tests):
     
     first_bg = next(iter(datasets))
     feature_names = datasets[first_bg]['feature_names']
+    scalers = {bg_name: model_info.get('scaler', datasets[bg_name]['scaler'])
+               for bg_name, model_info in models.items()}
     
     predictions = {}
     
-    signal_predictions = {}
-    for bg_name, model_info in models.items():
-        model = model_info['model']
-        
-        scaler = datasets[bg_name]['scaler']
-        
-        selected_features = model_info['features']
-        
-        X_signal = signal_test[feature_names]
-        X_signal_scaled = pd.DataFrame(
-            scaler.transform(X_signal),
-            columns=X_signal.columns,
-            index=X_signal.index
-        )
-        
-        X_signal_selected = X_signal_scaled[selected_features]
-        
-        preds = model.predict_proba(X_signal_selected)[:, 1]
-        
-        signal_predictions[bg_name] = preds
-    
     # ONLY the XGB predictions (no original features)
-    signal_df = pd.DataFrame()
-    for bg_name, preds in signal_predictions.items():
-        signal_df[f'BDTG_{bg_name}'] = preds
-    
+    signal_df = predict_topology(models, scalers, feature_names, signal_test)
     signal_df.to_csv('signal_predictions.csv', index=False)
     predictions['signal'] = signal_df
     print(f"  Created prediction file for signal")
     
     for bg_name_test, bg_test in background_tests.items():
-        bg_predictions = {}
-        
-        for bg_name_model, model_info in models.items():
-            model = model_info['model']
-            
-            scaler = datasets[bg_name_model]['scaler']
-            
-            selected_features = model_info['features']
-            
-            X_bg = bg_test[feature_names]
-            X_bg_scaled = pd.DataFrame(
-                scaler.transform(X_bg),
-                columns=X_bg.columns,
-                index=X_bg.index
-            )
-            
-            X_bg_selected = X_bg_scaled[selected_features]
-            
-            preds = model.predict_proba(X_bg_selected)[:, 1]
-            
-            bg_predictions[bg_name_model] = preds
-        
-        bg_df = pd.DataFrame()
-        for bg_name_model, preds in bg_predictions.items():
-            bg_df[f'BDTG_{bg_name_model}'] = preds
-        
+        bg_df = predict_topology(models, scalers, feature_names, bg_test)
         bg_df.to_csv(f'{bg_name_test}_predictions.csv', index=False)
         predictions[bg_name_test] = bg_df
         
@@ -379,7 +628,8 @@ def calculate_significance(signal_count, background_count):
         return 0
     return signal_count / np.sqrt(signal_count + background_count)
 
-def main(run_ga=False):
+def main(run_ga=False, export_splits=None, parallel_models=1, n_cores=None,
+         registry_dir=DEFAULT_REGISTRY_DIR):
     signal_file = "signal.csv"
     background_files = [
         "Bqq.csv", "Btt.csv", "BZZ.csv", "BWW.csv", 
@@ -405,16 +655,22 @@ def main(run_ga=False):
     
     # load and prepare data
     print("Loading and preparing data...")
-    datasets, signal_test, background_tests = load_data(signal_file, background_files)
+    exporter = SplitExporter(export_splits) if export_splits else None
+    datasets, signal_test, background_tests = load_data(signal_file, background_files, exporter=exporter)
     
     # train XGB models (originally BDTG so naming matches that)
     print("\nTraining XGB models...")
-    models = train_bdtg_models(datasets)
+    models = train_bdtg_models(datasets, n_parallel=parallel_models, n_cores=n_cores,
+                               registry_dir=registry_dir)
     
     # apply to all event topologies and create prediction files
     print("\nApplying models and creating prediction files...")
     predictions = apply_models(models, datasets, signal_test, background_tests)
     
+    if exporter is not None:
+        print("\nWaiting for train/test split exports...")
+        exporter.close()
+    
     print("\nXGB analysis complete! All prediction files have been saved.")
     
     if run_ga:
@@ -438,7 +694,19 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Run BDTG analysis with optional GA optimization')
     parser.add_argument('--run-ga', action='store_true', 
                         help='Run GA.py after generating BDTG predictions')
+    parser.add_argument('--export-splits', type=str, default=None, choices=['csv', 'parquet'],
+                        help='Also write the train/test splits in this format from a background thread (default: off)')
+    parser.add_argument('--parallel-models', type=int, default=1,
+                        help='Number of background models trained concurrently (default: 1)')
+    parser.add_argument('--cores', type=int, default=None,
+                        help='Cores split between the concurrent models (default: all)')
+    parser.add_argument('--registry-dir', type=str, default=DEFAULT_REGISTRY_DIR,
+                        help=f'Directory where trained models are saved and reused (default: {DEFAULT_REGISTRY_DIR})')
+    parser.add_argument('--no-registry', action='store_true',
+                        help='Always retrain and do not save the models')
     
     args = parser.parse_args()
     
-    main(run_ga=args.run_ga)
+    main(run_ga=args.run_ga, export_splits=args.export_splits,
+         parallel_models=args.parallel_models, n_cores=args.cores,
+         registry_dir=None if args.no_registry else args.registry_dir)
@@ -5,12 +5,38 @@ import random
 from deap import base, creator, tools, algorithms
 import multiprocessing
 import time
-import math
 import copy
-from numba_optimization import optimized_evaluate, prepare_data_for_numba
+import argparse
+import os
+import pickle
+from numba_optimization import (optimized_evaluate, prepare_data_for_numba, share_score_tables,
+                                 attach_score_tables, release_score_tables, shared_evaluate,
+                                 prepare_event_table, population_significance, quantize_event_table,
+                                 build_bitset_index, build_kdtree_index, DeltaEvaluator, snap_thresholds)
+from numba import get_num_threads, set_num_threads
+from cutRefinement import refine_thresholds, table_significance
+from relaxedCutOptimizer import optimize_relaxed_cuts
+import queue
 import threading
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+DEFAULT_CHECKPOINT_FILE = 'ga_checkpoint.pkl'
+
+# optima of previous runs, appended to by every run and read by --warm-start
+DEFAULT_ARCHIVE_FILE = 'threshold_archive.csv'
+
+# smallest per-feature spread of the warm-start perturbations and search box
+WARM_START_MIN_SPREAD = 0.02
+
+# population size from which fitness sharing looks up neighbours with a k-d tree
+NEIGHBOUR_INDEX_MIN_SIZE = 2000
+
 weights = {
     'signal': 0.0015552*1.155 * 4,  
     'Bqq': 0.0349 * 4,              
@@ -67,6 +93,252 @@ def calculate_significance(thresholds, signal_df, background_dfs):
 def evaluate(individual, signal_df, background_dfs):
     return optimized_evaluate(individual, signal_df, background_dfs, weights)
 
+def evaluate_population(individuals, table):
+    significances = population_significance(np.array(individuals, dtype=np.float64), table)
+    return [(significance,) for significance in significances]
+
+def evaluate_population_incremental(individuals, evaluator):
+    return [(evaluator.evaluate(ind),) for ind in individuals]
+
+class FitnessCache:
+    """
+    Bounded LRU cache of fitness values keyed on the threshold vector.
+    
+    One cache is shared by all islands (and their threads) of a run, so elites, migrants,
+    restart survivors and offspring left unchanged by crossover, mutation or clamping are
+    not evaluated again.
+    
+    Args:
+        max_size (int): Largest number of cached threshold vectors
+        decimals (int): Round the thresholds to this many decimals for the key (default: exact)
+    """
+    
+    def __init__(self, max_size=100000, decimals=None):
+        self.max_size = max_size
+        self.decimals = decimals
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def key(self, individual):
+        if self.decimals is None:
+            return tuple(individual)
+        return tuple(round(value, self.decimals) for value in individual)
+    
+    def get(self, key):
+        with self.lock:
+            fitness = self.entries.get(key)
+            if fitness is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return fitness
+    
+    def put(self, key, fitness):
+        with self.lock:
+            self.entries[key] = tuple(fitness)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def summary(self):
+        lookups = max(self.hits + self.misses, 1)
+        return (f"Fitness cache: {self.hits} hits, {self.misses} misses "
+                f"({100 * self.hits / lookups:.1f}% of evaluations saved), {len(self.entries)} entries")
+
+class MultiFidelityScreen:
+    """
+    Successive-halving screen of candidate threshold vectors on event subsamples.
+    
+    Every topology is subsampled once (fixed seed) to subsample_fraction of its events, at
+    least min_events, and reweighted by the inverse sampling fraction. Candidates are first
+    scored on the subsample; only the top promote_fraction, at least min_promoted (and a
+    random audit_fraction of the others) are evaluated on the full statistics. The rest keep
+    their subsample estimate, capped just below the worst promoted full-statistics fitness:
+    with min_promoted at least the number of elites, an estimate never enters the hall of
+    fame or the elites, so the returned best individual always has an exact fitness.
+    
+    The audited candidates measure the ranking error: a miss is an audited candidate whose
+    full-statistics fitness beats the worst promoted one, i.e. one the screen should have
+    promoted. The rank correlation between estimates and full fitnesses is tracked as well.
+    
+    Args:
+        table (dict): Float table from prepare_event_table
+        subsample_fraction (float): Fraction of the events of each topology in the subsample
+        promote_fraction (float): Fraction of the candidates evaluated on the full statistics
+        audit_fraction (float): Fraction of the other candidates also evaluated fully
+        min_events (int): Smallest subsample of a topology
+        min_promoted (int): Smallest number of promoted candidates of a batch
+        seed (int): Seed of the subsampling and audit draws
+    """
+    
+    def __init__(self, table, subsample_fraction=0.1, promote_fraction=0.25, audit_fraction=0.05,
+                 min_events=1000, min_promoted=15, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.promote_fraction = promote_fraction
+        self.min_promoted = min_promoted
+        self.audit_fraction = audit_fraction
+        
+        offsets = table['offsets']
+        rows = []
+        segment_weights = []
+        for k, (start, stop) in enumerate(zip(offsets[:-1], offsets[1:])):
+            n_events = stop - start
+            n_sampled = min(n_events, max(min_events, int(np.ceil(subsample_fraction * n_events))))
+            rows.append(start + np.sort(self.rng.choice(n_events, n_sampled, replace=False)))
+            segment_weights.append(table['segment_weights'][k] * n_events / max(n_sampled, 1))
+        
+        self.table = {
+            'events': np.ascontiguousarray(table['events'][np.concatenate(rows)]),
+            'offsets': np.cumsum([0] + [len(r) for r in rows]).astype(np.int64),
+            'segment_weights': np.array(segment_weights)
+        }
+        print(f"Multi-fidelity screen: {len(self.table['events'])} of {len(table['events'])} events, "
+              f"promoting the top {promote_fraction:.0%}")
+        
+        self.lock = threading.Lock()
+        self.n_screened = 0
+        self.n_promoted = 0
+        self.n_audited = 0
+        self.n_missed = 0
+        self.correlation_sum = 0.0
+        self.n_correlations = 0
+    
+    def select(self, vectors):
+        """Subsample estimates, indices to evaluate fully (promoted first, then audited), number promoted."""
+        estimates = population_significance(np.array(vectors, dtype=np.float64), self.table)
+        n = len(vectors)
+        n_promoted = max(self.min_promoted, int(np.ceil(self.promote_fraction * n)))
+        if n_promoted >= n:
+            return estimates, list(range(n)), n
+        
+        order = np.argsort(-estimates, kind='stable')
+        rest = order[n_promoted:]
+        with self.lock:
+            audited = rest[self.rng.random(len(rest)) < self.audit_fraction]
+        return estimates, list(order[:n_promoted]) + list(audited), n_promoted
+    
+    def capped_estimates(self, estimates, exact_fitnesses, n_promoted):
+        """Estimates as fitness tuples, strictly below the worst promoted full-statistics fitness."""
+        cutoff = np.nextafter(min(fitness[0] for fitness in exact_fitnesses[:n_promoted]), -np.inf)
+        return [(min(estimate, cutoff),) for estimate in estimates]
+    
+    def record(self, estimates, exact_indices, exact_fitnesses, n_promoted):
+        exact = np.array([fitness[0] for fitness in exact_fitnesses])
+        cutoff = exact[:n_promoted].min()
+        
+        with self.lock:
+            self.n_screened += len(estimates)
+            self.n_promoted += n_promoted
+            self.n_audited += len(exact) - n_promoted
+            self.n_missed += int(np.sum(exact[n_promoted:] > cutoff))
+            if len(exact) > 2:
+                estimate_ranks = np.argsort(np.argsort(estimates[list(exact_indices)]))
+                exact_ranks = np.argsort(np.argsort(exact))
+                correlation = np.corrcoef(estimate_ranks, exact_ranks)[0, 1]
+                if np.isfinite(correlation):
+                    self.correlation_sum += correlation
+                    self.n_correlations += 1
+    
+    def summary(self):
+        audited = max(self.n_audited, 1)
+        correlation = self.correlation_sum / max(self.n_correlations, 1)
+        return (f"Multi-fidelity screen: {self.n_promoted}/{self.n_screened} candidates promoted, "
+                f"{self.n_missed}/{self.n_audited} audited candidates misranked ({100 * self.n_missed / audited:.1f}%), "
+                f"mean rank correlation {correlation:.3f}")
+
+def evaluate_thresholds(toolbox, vectors):
+    """
+    Fitness values of threshold vectors (individuals or rows of a threshold matrix).
+    
+    Uses toolbox.evaluate_population to score the whole batch in one call when it is
+    registered, and maps toolbox.evaluate over the vectors otherwise. With a
+    toolbox.fitness_cache, cached threshold vectors and repeats within the batch are
+    evaluated only once.
+    
+    Returns:
+        tuple: (list of fitness tuples, number of vectors whose fitness came from the cache)
+    """
+    if len(vectors) == 0:
+        return [], 0
+    
+    cache = getattr(toolbox, "fitness_cache", None)
+    fitnesses = [None] * len(vectors)
+    hits = 0
+    if cache is None:
+        groups = {i: [i] for i in range(len(vectors))}
+    else:
+        groups = OrderedDict()
+        for i, vector in enumerate(vectors):
+            key = cache.key(vector)
+            if key in groups:
+                groups[key].append(i)
+                hits += 1
+                continue
+            fitness = cache.get(key)
+            if fitness is None:
+                groups[key] = [i]
+            else:
+                fitnesses[i] = fitness
+                hits += 1
+    
+    pending = [vectors[group[0]] for group in groups.values()]
+    if pending:
+        screen = getattr(toolbox, "fidelity_screen", None)
+        if screen is None:
+            exact_indices = range(len(pending))
+        else:
+            estimates, exact_indices, n_promoted = screen.select(pending)
+        
+        exact_vectors = [pending[j] for j in exact_indices]
+        if hasattr(toolbox, "evaluate_population"):
+            exact_fitnesses = toolbox.evaluate_population(exact_vectors)
+        else:
+            exact_fitnesses = toolbox.map(toolbox.evaluate, exact_vectors)
+        exact_fitnesses = list(exact_fitnesses)
+        
+        if screen is None:
+            pending_fitnesses = exact_fitnesses
+        else:
+            pending_fitnesses = screen.capped_estimates(estimates, exact_fitnesses, n_promoted)
+            for j, fitness in zip(exact_indices, exact_fitnesses):
+                pending_fitnesses[j] = fitness
+            screen.record(estimates, exact_indices, exact_fitnesses, n_promoted)
+        
+        exact = set(exact_indices)
+        for j, ((key, group), fitness) in enumerate(zip(groups.items(), pending_fitnesses)):
+            # subsample estimates are not cached, a later full evaluation must not be skipped
+            if cache is not None and j in exact:
+                cache.put(key, fitness)
+            for i in group:
+                fitnesses[i] = fitness
+    
+    return fitnesses, hits
+
+def snap_to_evaluation_grid(toolbox, thresholds):
+    """
+    Thresholds as a list, snapped to the grid of a quantized or bitset evaluation so that the
+    float cuts pass exactly the events of the cuts the GA scored (unchanged otherwise).
+    """
+    levels = getattr(toolbox, "threshold_levels", None)
+    if levels is None:
+        return list(thresholds)
+    return snap_thresholds(thresholds, levels).tolist()
+
+def evaluate_individuals(toolbox, individuals):
+    """
+    Assign fitness values to individuals (see evaluate_thresholds).
+    
+    Returns:
+        int: Number of individuals whose fitness came from the cache
+    """
+    fitnesses, hits = evaluate_thresholds(toolbox, individuals)
+    for ind, fit in zip(individuals, fitnesses):
+        ind.fitness.values = fit
+    return hits
+
 def create_educated_guesses(signal_df, background_dfs, n_guesses=5):
     feature_names = signal_df.columns
     n_features = len(feature_names)
@@ -115,6 +387,90 @@ def create_educated_guesses(signal_df, background_dfs, n_guesses=5):
     
     return guesses
 
+def load_threshold_archive(feature_names, archive_file=DEFAULT_ARCHIVE_FILE,
+                           thresholds_file='optimal_thresholds.csv', max_entries=20):
+    """
+    Optima of previous runs, best first, for warm-starting the GA.
+    
+    Reads the archive appended to by every run (one row per run, the thresholds and their
+    significance) and the last optimal_thresholds.csv, which ranks after the archived
+    entries when it is not archived itself. Runs with other features are ignored.
+    
+    Args:
+        feature_names (list): Features of the current run, in threshold order
+        archive_file (str): Archive written by append_to_archive
+        thresholds_file (str): Thresholds in the format written by main
+        max_entries (int): Largest number of distinct optima returned
+        
+    Returns:
+        array: (entries x features) thresholds, or None when nothing usable is on disk
+    """
+    feature_names = list(feature_names)
+    frames = []
+    for path in (archive_file, thresholds_file):
+        if path is None or not os.path.exists(path):
+            continue
+        df = pd.read_csv(path)
+        if not set(feature_names).issubset(df.columns):
+            print(f"Ignoring {path}: it was written for other features")
+            continue
+        if 'significance' not in df.columns:
+            df['significance'] = -np.inf
+        frames.append(df[feature_names + ['significance']])
+    if not frames:
+        return None
+    
+    archive = pd.concat(frames, ignore_index=True).dropna(subset=feature_names)
+    archive = archive.sort_values('significance', ascending=False, kind='stable')
+    archive = archive.round({feature: 6 for feature in feature_names}).drop_duplicates(subset=feature_names)
+    if archive.empty:
+        return None
+    return archive[feature_names].to_numpy(dtype=np.float64)[:max_entries]
+
+def append_to_archive(archive_file, feature_names, thresholds, significance, seed=None):
+    """Append the optimum of a run to the threshold archive, writing the header for a new file."""
+    new_file = not os.path.exists(archive_file)
+    with open(archive_file, 'a') as f:
+        if new_file:
+            f.write(','.join(list(feature_names) + ['significance', 'seed', 'timestamp']) + '\n')
+        f.write(','.join(f"{threshold:.6f}" for threshold in thresholds) +
+                f",{significance:.6f},{'' if seed is None else seed},{time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+
+def warm_start_populations(archive, n_islands, island_size, warm_fraction=0.5):
+    """
+    Initial island populations around the optima of previous runs.
+    
+    The initialization box is shrunk to the range of the archived optima, widened by their
+    spread (at least WARM_START_MIN_SPREAD per feature). In every island, warm_fraction of
+    the individuals are Gaussian perturbations of archived optima with that spread, the
+    islands cycling through the archive, and the rest are uniform in the shrunk box. No
+    archived optimum is inserted unperturbed, so runs with different seeds do not start
+    from the same point. Mutation still explores the full [0, 1] range.
+    
+    Args:
+        archive (array): (entries x features) thresholds from load_threshold_archive
+        n_islands (int): Number of islands
+        island_size (int): Individuals per island
+        warm_fraction (float): Fraction of each island perturbed from archived optima
+        
+    Returns:
+        list: Threshold lists of every island
+    """
+    archive = np.atleast_2d(np.asarray(archive, dtype=np.float64))
+    spread = np.maximum(archive.std(axis=0), WARM_START_MIN_SPREAD)
+    low = np.clip(archive.min(axis=0) - spread, 0.0, 1.0)
+    high = np.clip(archive.max(axis=0) + spread, 0.0, 1.0)
+    
+    populations = []
+    for i in range(n_islands):
+        population = np.random.uniform(low, high, (island_size, archive.shape[1]))
+        n_warm = int(warm_fraction * island_size)
+        parents = archive[(i + np.arange(n_warm)) % len(archive)]
+        population[:n_warm] = np.clip(parents + np.random.normal(0.0, spread, parents.shape), 0.0, 1.0)
+        populations.append(population.tolist())
+    
+    return populations
+
 def adaptive_mutation(individual, mu, sigma, indpb, gen, max_gen, fitness_improvement):
     progress = gen / max_gen
     
@@ -135,40 +491,179 @@ def adaptive_mutation(individual, mu, sigma, indpb, gen, max_gen, fitness_improv
     
     return individual,
 
-def calculate_shared_fitness(population, sigma_share=0.1):
-    n = len(population)
-    shared_fitnesses = []
-    
-    for i in range(n):
-        ind_i = population[i]
-        raw_fitness = ind_i.fitness.values[0]
-        
-        sharing_factor = 0
-        for j in range(n):
-            if i == j:
-                continue
-                
-            ind_j = population[j]
-            
-            distance = math.sqrt(sum((a - b) ** 2 for a, b in zip(ind_i, ind_j)))
-            
-            if distance < sigma_share:
-                sharing_component = 1 - (distance / sigma_share) ** 2
-                sharing_factor += sharing_component
+def _pairwise_distance_blocks(X, max_elements=4000000):
+    # Euclidean distances of blocks of rows of X to all rows, from the coordinate differences
+    n, n_features = X.shape
+    block_size = max(1, max_elements // max(n * n_features, 1))
+    for start in range(0, n, block_size):
+        diff = X[start:start + block_size, None, :] - X[None, :, :]
+        yield start, np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+
+def calculate_shared_fitness(population, sigma_share=0.1, neighbour_index=None, raw_fitness=None):
+    """
+    Fitness of every individual divided by its niche count 1 + sum(1 - (d / sigma_share)^2)
+    over the other individuals closer than sigma_share.
+    
+    Args:
+        population (list): Evaluated individuals, or a (population x features) threshold matrix
+        sigma_share (float): Niche radius
+        neighbour_index (bool): Find the pairs within sigma_share with a k-d tree (scipy) instead
+                                of computing all pairwise distances (default: for populations of
+                                NEIGHBOUR_INDEX_MIN_SIZE or more when scipy is available)
+        raw_fitness (array): Fitness of every row when population is a threshold matrix
         
-        shared_fitness = raw_fitness / (1 + sharing_factor)
-        shared_fitnesses.append(shared_fitness)
-    
-    return shared_fitnesses
+    Returns:
+        list: Shared fitness values
+    """
+    X = np.array(population, dtype=np.float64)
+    if raw_fitness is None:
+        raw_fitness = [ind.fitness.values[0] for ind in population]
+    raw_fitness = np.asarray(raw_fitness, dtype=np.float64)
+    n = len(X)
+    sharing_factor = np.zeros(n)
+    
+    if neighbour_index is None:
+        neighbour_index = cKDTree is not None and n >= NEIGHBOUR_INDEX_MIN_SIZE
+    
+    if neighbour_index:
+        if cKDTree is None:
+            raise ImportError("The neighbour index requires scipy")
+        pairs = cKDTree(X).query_pairs(sigma_share, output_type='ndarray')
+        distance = np.sqrt(np.sum((X[pairs[:, 0]] - X[pairs[:, 1]]) ** 2, axis=1))
+        close = distance < sigma_share
+        sharing_component = 1 - (distance[close] / sigma_share) ** 2
+        sharing_factor += np.bincount(pairs[close, 0], sharing_component, minlength=n)
+        sharing_factor += np.bincount(pairs[close, 1], sharing_component, minlength=n)
+    else:
+        for start, distance in _pairwise_distance_blocks(X):
+            rows = np.arange(len(distance))
+            close = distance < sigma_share
+            close[rows, start + rows] = False
+            sharing_factor[start:start + len(distance)] = np.sum(
+                np.where(close, 1 - (distance / sigma_share) ** 2, 0.0), axis=1)
+    
+    return (raw_fitness / (1 + sharing_factor)).tolist()
+
+def average_pairwise_distance(population, max_pairs=1000000):
+    """
+    Mean Euclidean distance between the individuals of a population.
+    
+    Exact up to max_pairs pairs; larger populations are estimated from max_pairs random pairs
+    (drawn from a fixed-seed generator, so the GA random streams are untouched).
+    """
+    X = np.array(population, dtype=np.float64)
+    n = len(X)
+    n_pairs = n * (n - 1) // 2
+    if n_pairs == 0:
+        return 0
+    
+    if n_pairs > max_pairs:
+        rng = np.random.default_rng(0)
+        i = rng.integers(0, n, max_pairs)
+        j = (i + rng.integers(1, n, max_pairs)) % n
+        return float(np.mean(np.sqrt(np.sum((X[i] - X[j]) ** 2, axis=1))))
+    
+    total_dist = 0.0
+    for start, distance in _pairwise_distance_blocks(X):
+        # each pair once: columns right of the diagonal
+        upper = np.arange(n)[None, :] > (start + np.arange(len(distance)))[:, None]
+        total_dist += np.sum(distance[upper])
+    return total_dist / n_pairs
+
+def create_deap_types():
+    # the creator classes are module globals, only create them for the first run in this process
+    if not hasattr(creator, "FitnessMax"):
+        creator.create("FitnessMax", base.Fitness, weights=(1.0,))
+    if not hasattr(creator, "Individual"):
+        creator.create("Individual", list, fitness=creator.FitnessMax)
 
-def setup_genetic_algorithm(signal_df, background_dfs):
-    creator.create("FitnessMax", base.Fitness, weights=(1.0,))
-    creator.create("Individual", list, fitness=creator.FitnessMax)
+def setup_genetic_algorithm(signal_df, background_dfs, processes=None, evaluation='pool',
+                            quantize_bits=None, index_resolution=256, index_memory_mb=1024,
+                            leaf_size=64, delta_memory_mb=1024,
+                            cache_size=0, cache_decimals=None, subsample_fraction=None,
+                            promote_fraction=0.25):
+    """
+    Build the DEAP toolbox and the fitness evaluation backend.
+    
+    Args:
+        processes (int): Worker processes evaluating the fitness, 1 evaluates in this process
+        evaluation (str): 'pool' evaluates individuals one by one (in the worker pool),
+                          'batch' scores whole generations with the parallel numba kernel,
+                          'bitset' with a per-feature bitset index (scan kernel if over the memory cap),
+                          'kdtree' with a k-d tree of per-node event counts,
+                          'delta' incrementally from the failed-cut counters of earlier individuals
+        quantize_bits (int): Store the scores as 8 or 16 bit bin indices for batch evaluation
+        index_resolution (int): Threshold levels per feature of the bitset index
+        index_memory_mb (float): Memory cap of the bitset index
+        leaf_size (int): Largest number of events in a k-d tree leaf
+        delta_memory_mb (float): Memory for the failed-cut counter states of the delta evaluator
+        cache_size (int): Entries of the fitness cache shared by all islands, 0 disables it
+        cache_decimals (int): Round the thresholds to this many decimals for the cache key
+        subsample_fraction (float): Screen candidates on this fraction of the events first
+                                    (MultiFidelityScreen), None evaluates all on the full statistics
+        promote_fraction (float): Fraction of the screened candidates evaluated on the full statistics
+        
+    Returns:
+        tuple: (toolbox, process pool or None, shared score tables or None)
+    """
+    create_deap_types()
     
     toolbox = base.Toolbox()
     
-    pool = multiprocessing.Pool()
-    toolbox.register("map", pool.map)
+    if quantize_bits is not None and evaluation not in ('batch', 'bitset'):
+        raise ValueError("Quantized scores are only supported with batch evaluation")
+    
+    if evaluation in ('batch', 'bitset', 'kdtree'):
+        # one multi-threaded numba call scores a whole generation, no worker processes needed
+        pool = None
+        shared_tables = None
+        table = prepare_event_table(signal_df, background_dfs, weights)
+        index = None
+        if evaluation == 'bitset':
+            index = build_bitset_index(table, index_resolution, index_memory_mb)
+            if index is None:
+                print("Falling back to the scan kernel")
+        elif evaluation == 'kdtree':
+            index = build_kdtree_index(table, leaf_size)
+        if index is not None:
+            table = index
+        elif quantize_bits is not None:
+            table = quantize_event_table(table, quantize_bits)
+            print(f"Scores quantized to {quantize_bits} bits ({table['events'].nbytes / 1e6:.1f} MB)")
+        toolbox.register("map", map)
+        toolbox.register("evaluate", evaluate, signal_df=signal_df, background_dfs=background_dfs)
+        toolbox.register("evaluate_population", evaluate_population, table=table)
+        # the fitness of quantized tables and bitset indices is that of the cuts snapped to this grid
+        toolbox.threshold_levels = table.get('levels')
+    elif evaluation == 'delta':
+        pool = None
+        shared_tables = None
+        toolbox.delta_evaluator = DeltaEvaluator(prepare_event_table(signal_df, background_dfs, weights),
+                                                 delta_memory_mb)
+        toolbox.register("map", map)
+        toolbox.register("evaluate", evaluate, signal_df=signal_df, background_dfs=background_dfs)
+        toolbox.register("evaluate_population", evaluate_population_incremental, evaluator=toolbox.delta_evaluator)
+    elif processes == 1:
+        pool = None
+        shared_tables = None
+        toolbox.register("map", map)
+        toolbox.register("evaluate", evaluate, signal_df=signal_df, background_dfs=background_dfs)
+    else:
+        # workers map the score tables once, tasks only carry the threshold vectors
+        shared_tables = share_score_tables(signal_df, background_dfs, weights)
+        try:
+            pool = multiprocessing.Pool(processes, initializer=attach_score_tables, initargs=(shared_tables,))
+        except BaseException:
+            release_score_tables(shared_tables)
+            raise
+        toolbox.register("map", pool.map)
+        toolbox.register("evaluate", shared_evaluate)
+    
+    if cache_size > 0:
+        toolbox.fitness_cache = FitnessCache(cache_size, cache_decimals)
+    if subsample_fraction is not None:
+        toolbox.fidelity_screen = MultiFidelityScreen(prepare_event_table(signal_df, background_dfs, weights),
+                                                      subsample_fraction, promote_fraction)
     
     toolbox.register("attr_float", random.uniform, 0, 1)
     
@@ -176,13 +671,11 @@ def setup_genetic_algorithm(signal_df, background_dfs):
     toolbox.register("individual", tools.initRepeat, creator.Individual, toolbox.attr_float, n=n_features)
     toolbox.register("population", tools.initRepeat, list, toolbox.individual)
     
-    toolbox.register("evaluate", evaluate, signal_df=signal_df, background_dfs=background_dfs)
-    
     toolbox.register("mate", tools.cxBlend, alpha=0.5)
     toolbox.register("mutate", tools.mutGaussian, mu=0, sigma=0.4, indpb=0.4)
     toolbox.register("select", tools.selTournament, tournsize=7)
     
-    return toolbox, pool
+    return toolbox, pool, shared_tables
 
 def eaAdvanced(population, toolbox, cxpb, mutpb, ngen, stats=None,
                halloffame=None, verbose=__debug__, signal_df=None, background_dfs=None):
@@ -191,18 +684,19 @@ def eaAdvanced(population, toolbox, cxpb, mutpb, ngen, stats=None,
     restart_diversity_factor = 0.7
     
     logbook = tools.Logbook()
-    logbook.header = ['gen', 'nevals'] + (stats.fields if stats else [])
+    cached = hasattr(toolbox, "fitness_cache")
+    logbook.header = ['gen', 'nevals'] + (['hits'] if cached else []) + (stats.fields if stats else [])
     
     invalid_ind = [ind for ind in population if not ind.fitness.valid]
-    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
-    for ind, fit in zip(invalid_ind, fitnesses):
-        ind.fitness.values = fit
+    hits = evaluate_individuals(toolbox, invalid_ind)
     
     if halloffame is not None:
         halloffame.update(population)
     
     record = stats.compile(population) if stats else {}
-    logbook.record(gen=0, nevals=len(invalid_ind), **record)
+    if cached:
+        record['hits'] = hits
+    logbook.record(gen=0, nevals=len(invalid_ind) - hits, **record)
     if verbose:
         print(logbook.stream)
     
@@ -240,9 +734,7 @@ def eaAdvanced(population, toolbox, cxpb, mutpb, ngen, stats=None,
                 del offspring[i].fitness.values
         
         invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
-        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
-        for ind, fit in zip(invalid_ind, fitnesses):
-            ind.fitness.values = fit
+        hits = evaluate_individuals(toolbox, invalid_ind)
         
         offspring.extend(elites)
         
@@ -261,7 +753,9 @@ def eaAdvanced(population, toolbox, cxpb, mutpb, ngen, stats=None,
         best_individual_history.append(copy.deepcopy(tools.selBest(population, 1)[0]))
         
         record = stats.compile(population) if stats else {}
-        logbook.record(gen=gen, nevals=len(invalid_ind), **record)
+        if cached:
+            record['hits'] = hits
+        logbook.record(gen=gen, nevals=len(invalid_ind) - hits, **record)
         if verbose:
             print(logbook.stream)
         
@@ -275,9 +769,7 @@ def eaAdvanced(population, toolbox, cxpb, mutpb, ngen, stats=None,
                 
                 new_individuals = [toolbox.individual() for _ in range(len(population) - keep_count)]
                 
-                fitnesses = toolbox.map(toolbox.evaluate, new_individuals)
-                for ind, fit in zip(new_individuals, fitnesses):
-                    ind.fitness.values = fit
+                evaluate_individuals(toolbox, new_individuals)
                 
                 population[:] = best_individuals + new_individuals
                 
@@ -300,107 +792,499 @@ def eaAdvanced(population, toolbox, cxpb, mutpb, ngen, stats=None,
     
     return population, logbook
 
-def island_model(signal_df, background_dfs, n_islands=5, n_migrations=5, 
-                 island_size=100, n_gen_per_migration=40, total_gen=100):
-    print("Starting Parallel Island Model optimization...")
+def eaArray(population, toolbox, cxpb, mutpb, ngen, stats=None,
+            halloffame=None, verbose=__debug__, signal_df=None, background_dfs=None):
+    """
+    Array-backed version of eaAdvanced with the same elitism, fitness sharing, stagnation
+    restart and early stopping.
+    
+    The island is evolved as a (population x features) threshold matrix with a fitness
+    vector: tournament selection, blend crossover, adaptive Gaussian mutation and clipping
+    are vectorized, and every generation's new rows go to the fitness backend in one batch.
+    Draws come from the NumPy generator instead of random. Individuals are only built
+    again for the returned population and the hall of fame.
+    """
+    num_elites = 15
+    stagnation_limit = 15
+    restart_diversity_factor = 0.7
+    tournsize = 7
+    alpha = 0.5
     
-    base_toolbox, pool = setup_genetic_algorithm(signal_df, background_dfs)
+    logbook = tools.Logbook()
+    cached = hasattr(toolbox, "fitness_cache")
+    logbook.header = ['gen', 'nevals'] + (['hits'] if cached else []) + (stats.fields if stats else [])
+    
+    def record_generation(gen, nevals, hits):
+        record = {}
+        if stats:
+            values = fitness.reshape(-1, 1)
+            record = {name: func(values) for name, func in stats.functions.items()}
+        if cached:
+            record['hits'] = hits
+        logbook.record(gen=gen, nevals=nevals, **record)
+        if verbose:
+            print(logbook.stream)
     
-    print("Generating educated initial guesses...")
-    educated_guesses = create_educated_guesses(signal_df, background_dfs, n_guesses=min(5, island_size//2))
+    def evaluate_rows(rows):
+        fitnesses, hits = evaluate_thresholds(toolbox, X[rows])
+        fitness[rows] = [fit[0] for fit in fitnesses]
+        return len(rows) - hits, hits
     
-    islands = []
-    for i in range(n_islands):
-        random_pop = base_toolbox.population(n=island_size)
+    def update_halloffame():
+        if halloffame is not None:
+            best = creator.Individual(X[np.argmax(fitness)].tolist())
+            best.fitness.values = (fitness.max(),)
+            halloffame.update([best])
+    
+    X = np.array(population, dtype=np.float64)
+    fitness = np.array([ind.fitness.values[0] if ind.fitness.valid else np.nan for ind in population])
+    pop_size, n_features = X.shape
+    
+    nevals, hits = evaluate_rows(np.flatnonzero(np.isnan(fitness)))
+    update_halloffame()
+    record_generation(0, nevals, hits)
+    
+    best_fitness_history = [fitness.max()]
+    best_individual_history = [X[np.argmax(fitness)].copy()]
+    
+    early_stop_threshold = 0.001
+    patience = 20
+    
+    for gen in range(1, ngen + 1):
+        if gen >= 5:
+            fitness_improvement = (best_fitness_history[-1] - best_fitness_history[-5]) / best_fitness_history[-5]
+        else:
+            fitness_improvement = 1.0
+        
+        n_offspring = pop_size - num_elites
+        
+        # tournament selection: best of tournsize random rows, for every offspring at once
+        contestants = np.random.randint(0, pop_size, size=(n_offspring, tournsize))
+        winners = contestants[np.arange(n_offspring), np.argmax(fitness[contestants], axis=1)]
+        
+        elite_rows = np.argsort(-fitness, kind='stable')[:num_elites]
+        
+        offspring = X[winners]
+        offspring_fitness = fitness[winners]
+        
+        # blend crossover of consecutive pairs, clamped to valid BDTG thresholds
+        n_pairs = n_offspring // 2
+        mate = np.random.random(n_pairs) < cxpb
+        first = 2 * np.flatnonzero(mate)
+        gamma = (1 + 2 * alpha) * np.random.random((len(first), n_features)) - alpha
+        parent1 = offspring[first]
+        parent2 = offspring[first + 1]
+        offspring[first] = np.clip((1 - gamma) * parent1 + gamma * parent2, 0.0, 1.0)
+        offspring[first + 1] = np.clip(gamma * parent1 + (1 - gamma) * parent2, 0.0, 1.0)
+        offspring_fitness[first] = np.nan
+        offspring_fitness[first + 1] = np.nan
+        
+        # adaptive Gaussian mutation, same schedule as adaptive_mutation
+        progress = gen / ngen
+        if fitness_improvement > 0.05:
+            sigma = 0.4 * (0.5 - 0.3 * progress)
+            indpb = 0.4 * (0.5 - 0.3 * progress)
+        else:
+            sigma = 0.4 * (1.0 - 0.5 * progress)
+            indpb = 0.4 * (1.0 - 0.5 * progress)
+        sigma = max(0.05, sigma)
+        indpb = max(0.05, indpb)
+        
+        mutants = np.flatnonzero(np.random.random(n_offspring) < mutpb)
+        genes = np.random.random((len(mutants), n_features)) < indpb
+        noise = np.random.normal(0.0, sigma, (len(mutants), n_features))
+        offspring[mutants] = np.clip(offspring[mutants] + genes * noise, 0.0, 1.0)
+        offspring_fitness[mutants] = np.nan
+        
+        X = np.vstack([offspring, X[elite_rows]])
+        fitness = np.concatenate([offspring_fitness, fitness[elite_rows]])
+        nevals, hits = evaluate_rows(np.flatnonzero(np.isnan(fitness)))
+        
+        if gen % 5 == 0:
+            fitness = np.array(calculate_shared_fitness(X, raw_fitness=fitness))
         
-        if educated_guesses and i == 0:
-            for j, guess in enumerate(educated_guesses):
-                if j < len(random_pop):
-                    for k, val in enumerate(guess):
-                        random_pop[j][k] = val
+        update_halloffame()
+        
+        best_fitness_history.append(fitness.max())
+        best_individual_history.append(X[np.argmax(fitness)].copy())
+        
+        record_generation(gen, nevals, hits)
+        
+        if gen > stagnation_limit:
+            recent_best = max(best_fitness_history[-stagnation_limit:])
+            if best_fitness_history[-1] <= recent_best and best_fitness_history[-1] == best_fitness_history[-stagnation_limit]:
+                print(f"\nGeneration {gen}: Stagnation detected! Performing partial restart...")
+                
+                keep_count = int(pop_size * (1 - restart_diversity_factor))
+                keep_rows = np.argsort(-fitness, kind='stable')[:keep_count]
+                
+                X = np.vstack([X[keep_rows], np.random.random((pop_size - keep_count, n_features))])
+                fitness = np.concatenate([fitness[keep_rows], np.full(pop_size - keep_count, np.nan)])
+                evaluate_rows(np.arange(keep_count, pop_size))
+                
+                mutpb = 0.5
+                print(f"Restart complete. New mutation rate: {mutpb}")
         
-        islands.append(random_pop)
+        if gen > patience:
+            improvement = (best_fitness_history[-1] - best_fitness_history[-patience]) / best_fitness_history[-patience]
+            if improvement < early_stop_threshold:
+                print(f"\nEarly stopping at generation {gen}: Improvement below threshold ({improvement:.6f} < {early_stop_threshold})")
+                break
     
-    island_hofs = [tools.HallOfFame(1) for _ in range(n_islands)]
+    best_gen_idx = int(np.argmax(best_fitness_history))
     
+    if best_gen_idx < len(best_individual_history) - 1:
+        print(f"\nBest individual found at generation {best_gen_idx}, not in final population. Restoring best individual.")
+        worst_idx = int(np.argmin(fitness))
+        X[worst_idx] = best_individual_history[best_gen_idx]
+        fitness[worst_idx] = best_fitness_history[best_gen_idx]
+    
+    population = []
+    for row, fit in zip(X, fitness):
+        ind = creator.Individual(row.tolist())
+        ind.fitness.values = (fit,)
+        population.append(ind)
+    
+    return population, logbook
+
+# GA engines usable by island_model, same signature
+ENGINES = {'deap': eaAdvanced, 'array': eaArray}
+
+def island_statistics():
     stats = tools.Statistics(lambda ind: ind.fitness.values)
     stats.register("avg", np.mean)
     stats.register("std", np.std)
     stats.register("min", np.min)
     stats.register("max", np.max)
+    return stats
+
+def migration_rate(island):
+    # less diverse islands send more migrants
+    base_migration_rate = 0.1
+    rate = base_migration_rate * (1 + (1 - average_pairwise_distance(island)))
+    return min(0.3, max(0.05, rate))
+
+def _pack_individuals(individuals):
+    return [(list(ind), ind.fitness.values) for ind in individuals]
+
+def _unpack_individuals(packed):
+    individuals = []
+    for thresholds, fitness in packed:
+        ind = creator.Individual(thresholds)
+        if fitness:
+            ind.fitness.values = fitness
+        individuals.append(ind)
+    return individuals
+
+def save_checkpoint(checkpoint_file, state):
+    # written to a temporary file first so a preempted job never leaves a truncated checkpoint
+    tmp_file = checkpoint_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(state, f)
+    os.replace(tmp_file, checkpoint_file)
+
+def load_checkpoint(checkpoint_file):
+    with open(checkpoint_file, 'rb') as f:
+        return pickle.load(f)
+
+def island_model(signal_df, background_dfs, n_islands=5, n_migrations=5, 
+                 island_size=100, n_gen_per_migration=40, total_gen=100,
+                 verbose=True, engine='deap', checkpoint_file=None, resume=False,
+                 warm_start=None, **evaluation_options):
+    """
+    Island model with threaded islands and ring migration every n_gen_per_migration generations.
+    
+    With a checkpoint_file, the island populations and fitnesses, the halls of fame, the best
+    fitness after every migration cycle and the random and NumPy generator states are saved
+    after each cycle. The engines restart their history and mutation rate at every cycle, so
+    this is the complete state: resume=True continues from the last completed cycle and,
+    with islands evolving one at a time (one core), reproduces the uninterrupted run.
+    
+    warm_start, an archive of previous optima from load_threshold_archive, replaces the
+    uniform initial populations with warm_start_populations.
+    """
+    print("Starting Parallel Island Model optimization...")
     
-    global_hof = tools.HallOfFame(1)
+    # evaluation_options are the keyword arguments of setup_genetic_algorithm
+    base_toolbox, pool, shared_tables = setup_genetic_algorithm(signal_df, background_dfs, **evaluation_options)
     
-    for migration in range(n_migrations):
-        print(f"\nMigration cycle {migration+1}/{n_migrations}")
-        
-        with ThreadPoolExecutor(max_workers=min(n_islands, multiprocessing.cpu_count())) as executor:
-            futures = []
-            for i in range(n_islands):
-                print(f"Submitting Island {i+1}/{n_islands} for evolution")
-                future = executor.submit(
-                    eaAdvanced,
-                    islands[i],
-                    base_toolbox,
-                    0.7,  # cxpb
-                    0.3,  # mutpb
-                    n_gen_per_migration,
-                    stats,
-                    island_hofs[i],
-                    True,  # verbose
-                    signal_df,
-                    background_dfs
-                )
-                futures.append((i, future))
-            
-            for i, future in futures:
-                islands[i], _ = future.result()
-                global_hof.update(islands[i])
-                print(f"Island {i+1}/{n_islands} evolution completed")
+    # the worker pool and the /dev/shm score tables are released even when a cycle fails
+    try:
+        print("Generating educated initial guesses...")
+        educated_guesses = create_educated_guesses(signal_df, background_dfs, n_guesses=min(5, island_size//2))
         
-        if migration < n_migrations - 1:
-            print("\nPerforming migration between islands...")
+        if warm_start is not None:
+            print(f"Warm-starting the islands from {len(warm_start)} archived optima")
+            warm_populations = warm_start_populations(warm_start, n_islands, island_size)
+        
+        islands = []
+        for i in range(n_islands):
+            if warm_start is not None:
+                random_pop = [creator.Individual(thresholds) for thresholds in warm_populations[i]]
+            else:
+                random_pop = base_toolbox.population(n=island_size)
+            
+            if educated_guesses and i == 0:
+                for j, guess in enumerate(educated_guesses):
+                    if j < len(random_pop):
+                        for k, val in enumerate(guess):
+                            random_pop[j][k] = val
             
-            diversity_measures = []
-            for island in islands:
-                total_dist = 0
-                count = 0
-                for i in range(len(island)):
-                    for j in range(i+1, len(island)):
-                        dist = math.sqrt(sum((a - b) ** 2 for a, b in zip(island[i], island[j])))
-                        total_dist += dist
-                        count += 1
-                avg_dist = total_dist / count if count > 0 else 0
-                diversity_measures.append(avg_dist)
+            islands.append(random_pop)
+        
+        island_hofs = [tools.HallOfFame(1) for _ in range(n_islands)]
+        
+        stats = island_statistics()
+        
+        global_hof = tools.HallOfFame(1)
+        
+        settings = {
+            'n_islands': n_islands,
+            'n_migrations': n_migrations,
+            'island_size': island_size,
+            'n_gen_per_migration': n_gen_per_migration,
+            'engine': engine
+        }
+        start_migration = 0
+        cycle_best_history = []
+        
+        if resume and checkpoint_file is not None and os.path.exists(checkpoint_file):
+            state = load_checkpoint(checkpoint_file)
+            if state['settings'] != settings:
+                raise ValueError(f"Checkpoint {checkpoint_file} was written with different settings: {state['settings']}")
             
-            base_migration_rate = 0.1
-            migration_rates = []
-            for div in diversity_measures:
-                rate = base_migration_rate * (1 + (1 - div))
-                migration_rates.append(min(0.3, max(0.05, rate)))
+            islands = [_unpack_individuals(island) for island in state['islands']]
+            for hof, packed in zip(island_hofs, state['island_hofs']):
+                hof.update(_unpack_individuals(packed))
+            global_hof.update(_unpack_individuals(state['global_hof']))
+            random.setstate(state['random_state'])
+            np.random.set_state(state['numpy_state'])
+            start_migration = state['migration']
+            cycle_best_history = state['cycle_best_history']
+            print(f"Resuming from {checkpoint_file} after migration cycle {start_migration}/{n_migrations} "
+                  f"(best fitness so far: {cycle_best_history[-1]:.6f})")
+        elif resume:
+            print("No checkpoint to resume from, starting a new run")
+        
+        # numba thread limits are per thread, the island threads take over the caller's
+        n_threads = get_num_threads()
+        for migration in range(start_migration, n_migrations):
+            print(f"\nMigration cycle {migration+1}/{n_migrations}")
             
-            for i in range(n_islands):
-                source = i
-                dest = (i + 1) % n_islands
+            with ThreadPoolExecutor(max_workers=min(n_islands, multiprocessing.cpu_count()),
+                                    initializer=set_num_threads, initargs=(n_threads,)) as executor:
+                futures = []
+                for i in range(n_islands):
+                    print(f"Submitting Island {i+1}/{n_islands} for evolution")
+                    future = executor.submit(
+                        ENGINES[engine],
+                        islands[i],
+                        base_toolbox,
+                        0.7,  # cxpb
+                        0.3,  # mutpb
+                        n_gen_per_migration,
+                        stats,
+                        island_hofs[i],
+                        verbose,
+                        signal_df,
+                        background_dfs
+                    )
+                    futures.append((i, future))
                 
-                n_migrants = max(1, int(island_size * migration_rates[source]))
-                print(f"  Island {source+1} → Island {dest+1}: {n_migrants} migrants (rate: {migration_rates[source]:.2f})")
-                
-                migrants = tools.selBest(islands[source], n_migrants)
+                for i, future in futures:
+                    islands[i], _ = future.result()
+                    global_hof.update(islands[i])
+                    print(f"Island {i+1}/{n_islands} evolution completed")
+            
+            if migration < n_migrations - 1:
+                print("\nPerforming migration between islands...")
                 
-                worst_indices = sorted(range(len(islands[dest])), 
-                                       key=lambda j: islands[dest][j].fitness.values[0])[:n_migrants]
+                migration_rates = [migration_rate(island) for island in islands]
                 
-                for j, worst_idx in enumerate(worst_indices):
-                    islands[dest][worst_idx] = base_toolbox.clone(migrants[j])
+                for i in range(n_islands):
+                    source = i
+                    dest = (i + 1) % n_islands
+                    
+                    n_migrants = max(1, int(island_size * migration_rates[source]))
+                    print(f"  Island {source+1} → Island {dest+1}: {n_migrants} migrants (rate: {migration_rates[source]:.2f})")
+                    
+                    migrants = tools.selBest(islands[source], n_migrants)
+                    
+                    worst_indices = sorted(range(len(islands[dest])), 
+                                           key=lambda j: islands[dest][j].fitness.values[0])[:n_migrants]
+                    
+                    for j, worst_idx in enumerate(worst_indices):
+                        islands[dest][worst_idx] = base_toolbox.clone(migrants[j])
+            
+            cycle_best_history.append(global_hof[0].fitness.values[0])
+            if checkpoint_file is not None:
+                save_checkpoint(checkpoint_file, {
+                    'settings': settings,
+                    'migration': migration + 1,
+                    'islands': [_pack_individuals(island) for island in islands],
+                    'island_hofs': [_pack_individuals(hof) for hof in island_hofs],
+                    'global_hof': _pack_individuals(global_hof),
+                    'cycle_best_history': cycle_best_history,
+                    'random_state': random.getstate(),
+                    'numpy_state': np.random.get_state()
+                })
+                print(f"Checkpoint saved to {checkpoint_file} (migration cycle {migration+1}/{n_migrations})")
+        
+        combined_population = []
+        for island in islands:
+            combined_population.extend(island)
+        
+        global_hof.update(combined_population)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if shared_tables is not None:
+            release_score_tables(shared_tables)
+    if hasattr(base_toolbox, "delta_evaluator"):
+        print(base_toolbox.delta_evaluator.summary())
+    for summary_owner in ("fitness_cache", "fidelity_screen"):
+        if hasattr(base_toolbox, summary_owner):
+            print(getattr(base_toolbox, summary_owner).summary())
     
-    combined_population = []
-    for island in islands:
-        combined_population.extend(island)
+    best_individual = global_hof[0]
+    best_fitness = best_individual.fitness.values[0]
+    best_individual = snap_to_evaluation_grid(base_toolbox, best_individual)
     
-    global_hof.update(combined_population)
+    print(f"\nBest fitness across all islands: {best_fitness:.6f}")
     
-    pool.close()
+    return best_individual, best_fitness, None
+
+def _island_process(index, population, data, n_migrations, n_gen_per_migration, seed,
+                    inbox, outbox, results, n_threads, verbose, engine, evaluation_options):
+    """Evolve one island in its own process, exchanging migrants through queues."""
+    random.seed(seed)
+    np.random.seed(seed)
+    set_num_threads(n_threads)
+    
+    # this island's view of the scores, mapped from the shared file
+    table = np.load(data['path'], mmap_mode='r')
+    offsets = data['offsets']
+    signal_df = pd.DataFrame(table[offsets[0]:offsets[1]], columns=data['columns'])
+    background_dfs = {bg_type: pd.DataFrame(table[start:stop], columns=data['columns'])
+                      for bg_type, start, stop in zip(data['bg_types'], offsets[1:-1], offsets[2:])}
+    
+    toolbox, pool, shared_tables = setup_genetic_algorithm(signal_df, background_dfs, **evaluation_options)
+    island = [creator.Individual(thresholds) for thresholds in population]
+    hof = tools.HallOfFame(1)
+    stats = island_statistics()
+    
+    for epoch in range(n_migrations):
+        island, _ = ENGINES[engine](island, toolbox, 0.7, 0.3, n_gen_per_migration, stats, hof,
+                                    verbose, signal_df, background_dfs)
+        
+        if epoch < n_migrations - 1:
+            n_migrants = max(1, int(len(island) * migration_rate(island)))
+            outbox.put([(list(ind), ind.fitness.values) for ind in tools.selBest(island, n_migrants)])
+            
+            # take in whatever has arrived from the previous island, without waiting for it
+            arrived = 0
+            while True:
+                try:
+                    migrants = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                worst_indices = sorted(range(len(island)), key=lambda j: island[j].fitness.values[0])[:len(migrants)]
+                for worst_idx, (thresholds, fitness) in zip(worst_indices, migrants):
+                    island[worst_idx] = creator.Individual(thresholds)
+                    island[worst_idx].fitness.values = fitness
+                arrived += len(migrants)
+            print(f"Island {index+1} epoch {epoch+1}/{n_migrations}: sent {n_migrants} migrants, received {arrived}")
+    
+    for summary_owner in ("delta_evaluator", "fitness_cache", "fidelity_screen"):
+        if hasattr(toolbox, summary_owner):
+            print(f"Island {index+1}: {getattr(toolbox, summary_owner).summary()}")
+    
+    # migrants nobody will read any more must not keep this process alive
+    outbox.cancel_join_thread()
+    results.put((index, snap_to_evaluation_grid(toolbox, hof[0]), hof[0].fitness.values))
+
+def async_island_model(signal_df, background_dfs, n_islands=5, n_migrations=5,
+                       island_size=100, n_gen_per_migration=40, total_gen=100,
+                       verbose=True, engine='deap', warm_start=None, **evaluation_options):
+    """
+    Island model with one process per island and asynchronous ring migration.
+    
+    Each island evolves in its own process on a memory-mapped view of the score tables and
+    numba threads split between the islands. After every n_gen_per_migration generations an
+    island sends its best individuals to the next island's queue and absorbs the migrants
+    that have already arrived in its own, so no island waits for another. Same arguments
+    (except the checkpoints) and return value as island_model.
+    """
+    print("Starting asynchronous process-based Island Model optimization...")
+    
+    if evaluation_options.get('evaluation', 'pool') == 'pool':
+        # the island processes are the parallelism, no worker pool inside them
+        evaluation_options = dict(evaluation_options, processes=1)
+    
+    print("Generating educated initial guesses...")
+    educated_guesses = create_educated_guesses(signal_df, background_dfs, n_guesses=min(5, island_size//2))
+    
+    n_features = len(signal_df.columns)
+    if warm_start is not None:
+        print(f"Warm-starting the islands from {len(warm_start)} archived optima")
+        populations = warm_start_populations(warm_start, n_islands, island_size)
+    else:
+        populations = [[[random.uniform(0, 1) for _ in range(n_features)] for _ in range(island_size)]
+                       for _ in range(n_islands)]
+    for j, guess in enumerate(educated_guesses[:island_size]):
+        populations[0][j] = list(guess)
+    seeds = [random.randrange(2**32) for _ in range(n_islands)]
+    
+    shared_tables = share_score_tables(signal_df, background_dfs, weights)
+    data = {
+        'path': shared_tables['path'],
+        'offsets': shared_tables['offsets'],
+        'columns': list(signal_df.columns),
+        'bg_types': list(background_dfs)
+    }
+    n_threads = max(1, multiprocessing.cpu_count() // n_islands)
+    
+    # spawn: the islands start without the parent's threads and numba state
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in range(n_islands)]
+    results = context.Queue()
+    processes = []
+    try:
+        for i in range(n_islands):
+            process = context.Process(
+                target=_island_process,
+                args=(i, populations[i], data, n_migrations, n_gen_per_migration, seeds[i],
+                      queues[i], queues[(i + 1) % n_islands], results, n_threads, verbose,
+                      engine, evaluation_options)
+            )
+            process.start()
+            processes.append(process)
+        
+        island_results = []
+        while len(island_results) < n_islands:
+            try:
+                island_results.append(results.get(timeout=10))
+            except queue.Empty:
+                failed = [i + 1 for i, process in enumerate(processes)
+                          if not process.is_alive() and process.exitcode != 0]
+                if failed:
+                    raise RuntimeError(f"Island process(es) {', '.join(map(str, failed))} failed")
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        release_score_tables(shared_tables)
+    
+    create_deap_types()
+    global_hof = tools.HallOfFame(1)
+    for index, thresholds, fitness in sorted(island_results):
+        print(f"Island {index+1}/{n_islands} best fitness: {fitness[0]:.6f}")
+        ind = creator.Individual(thresholds)
+        ind.fitness.values = fitness
+        global_hof.update([ind])
     
     best_individual = global_hof[0]
     best_fitness = best_individual.fitness.values[0]
@@ -454,24 +1338,165 @@ def plot_evolution(logbook):
     plt.savefig('fitness_evolution.png')
     plt.close()
 
-def main():
+def run_optimization(signal_df, background_dfs, seed=None, verbose=True,
+                     measure_cross_section=True, **options):
+    """
+    Run the island model GA once and collect the results main reports.
+    
+    Args:
+        signal_df (DataFrame): Signal BDTG scores
+        background_dfs (dict): Background name -> BDTG scores
+        seed (int): Seed for the random and NumPy generators (default: unseeded)
+        verbose (bool): Print the logbook of every generation
+        measure_cross_section (bool): Also run crossSectionMeasurement on the best cuts
+        **options: optimizer ('ga' or 'relaxed'), relaxed_starts, relaxed_steps, refine,
+                   islands ('threads' or 'processes'), engine, checkpoint_file, resume,
+                   warm_start (archive from load_threshold_archive), plot_path (chi-squared
+                   plot of the cross-section measurement) and the
+                   evaluation options passed to setup_genetic_algorithm (see ga_options)
+        
+    Returns:
+        dict: significance, best_individual, thresholds, event_stats, total_initial_bg,
+              total_surviving_bg and, if measured, cross_section
+    """
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    
+    refine = options.pop('refine', True)
+    optimizer = options.pop('optimizer', 'ga')
+    relaxed_starts = options.pop('relaxed_starts', 32)
+    relaxed_steps = options.pop('relaxed_steps', 300)
+    warm_start = options.pop('warm_start', None)
+    plot_path = options.pop('plot_path', None)
+    
+    model = island_model
+    if options.pop('islands', 'threads') == 'processes':
+        model = async_island_model
+        if options.pop('resume', False):
+            raise ValueError("Resuming is only supported with threaded islands")
+        if options.pop('checkpoint_file', None) is not None:
+            print("Checkpoints are not written with process islands")
+    table = None
+    if optimizer == 'relaxed':
+        print("\nRunning the relaxed-cut optimizer...")
+        table = prepare_event_table(signal_df, background_dfs, weights)
+        starts = np.array(create_educated_guesses(signal_df, background_dfs, n_guesses=relaxed_starts)).reshape(-1, len(signal_df.columns))
+        if warm_start is not None:
+            starts = np.vstack([warm_start, starts])[:relaxed_starts]
+        n_random = max(0, relaxed_starts - len(starts))
+        starts = np.vstack([starts, np.random.random((n_random, len(signal_df.columns)))])
+        candidates, significances = optimize_relaxed_cuts(table, starts, steps=relaxed_steps, verbose=verbose)
+        best = int(np.argmax(significances))
+        best_individual = candidates[best].tolist()
+        best_significance = significances[best]
+    else:
+        best_individual, best_significance, _ = model(
+            signal_df, background_dfs, 
+            n_islands=5,
+            n_migrations=5,
+            island_size=100,
+            n_gen_per_migration=40,
+            total_gen=100,
+            verbose=verbose,
+            warm_start=warm_start,
+            **options
+        )
+    
+    quantized = optimizer == 'ga' and (options.get('quantize_bits') is not None or options.get('evaluation') == 'bitset')
+    
+    # the optimizer's fitness can be quantized or a subsample estimate, the reported significance
+    # is always that of the float scores the event statistics and the cross section use
+    if table is None:
+        table = prepare_event_table(signal_df, background_dfs, weights)
+    ga_significance = table_significance(best_individual, table)
+    if quantized:
+        quantized_significance = best_significance
+        print(f"\nQuantized significance: {quantized_significance:.6f}, "
+              f"float path: {ga_significance:.6f} (drift {quantized_significance - ga_significance:+.6f})")
+    best_significance = ga_significance
+    
+    if refine:
+        print("\nRefining the thresholds by coordinate ascent...")
+        refined, refined_significance, rounds = refine_thresholds(best_individual, table, verbose=verbose)
+        print(f"Significance before refinement: {ga_significance:.6f}, refined: {refined_significance:.6f} after {rounds} rounds")
+        if refined_significance > ga_significance:
+            best_individual = refined
+            best_significance = refined_significance
+    
+    print("\nCalculating event statistics...")
+    event_stats = calculate_event_statistics(best_individual, signal_df, background_dfs)
+    
+    total_initial_bg = sum(stats['initial_weighted'] for topology, stats in event_stats.items() if topology != 'signal')
+    total_surviving_bg = sum(stats['surviving_weighted'] for topology, stats in event_stats.items() if topology != 'signal')
+    
+    results = {
+        'seed': seed,
+        'significance': best_significance,
+        'best_individual': list(best_individual),
+        'thresholds': {feature: best_individual[i] for i, feature in enumerate(signal_df.columns)},
+        'event_stats': event_stats,
+        'total_initial_bg': total_initial_bg,
+        'total_surviving_bg': total_surviving_bg
+    }
+    
+    if quantized:
+        results['quantized_significance'] = quantized_significance
+    if refine:
+        results['ga_significance'] = ga_significance
+    
+    if measure_cross_section:
+        try:
+            print("\n=== CROSS SECTION MEASUREMENT ===")
+            signal_surviving = event_stats['signal']['surviving_weighted']
+            background_surviving = total_surviving_bg
+            
+            print(f"Running cross-section measurement with:")
+            print(f"  Signal events: {signal_surviving:.6f}")
+            print(f"  Background events: {background_surviving:.6f}")
+            
+            import crossSectionMeasurement
+            
+            cross_section_result = crossSectionMeasurement.find_cross_section_HHbbbb(
+                signal_surviving, background_surviving, plot_path=plot_path)
+            
+            results['cross_section'] = {
+                'signal_events': signal_surviving,
+                'background_events': background_surviving,
+                'cross_section': cross_section_result['cross_section'],
+                'error_top': cross_section_result['error_top'],
+                'error_bottom': cross_section_result['error_bottom']
+            }
+            
+        except Exception as e:
+            print(f"\nError running cross-section measurement: {e}")
+            print("Please ensure crossSectionMeasurement.py is in the same directory.")
+    
+    return results
+
+def main(options=None):
+    if options is None:
+        options = parse_arguments([])
+    
     start_time = time.time()
     
     print("Loading data...")
     signal_df, background_dfs = load_data()
     
+    run_options = ga_options(options)
+    if options.warm_start:
+        run_options['warm_start'] = load_threshold_archive(signal_df.columns, options.archive)
+        if run_options['warm_start'] is None:
+            print(f"No previous optima in {options.archive} or optimal_thresholds.csv, starting from scratch")
+    
     print("\nRunning Island Model Genetic Algorithm...")
-    best_individual, best_significance, _ = island_model(
-        signal_df, background_dfs, 
-        n_islands=5,
-        n_migrations=5,
-        island_size=100,
-        n_gen_per_migration=40,
-        total_gen=100
-    )
+    results = run_optimization(signal_df, background_dfs, seed=options.seed, **run_options)
     
-    print("\nCalculating event statistics...")
-    event_stats = calculate_event_statistics(best_individual, signal_df, background_dfs)
+    best_individual = results['best_individual']
+    best_significance = results['significance']
+    event_stats = results['event_stats']
+    total_initial_bg = results['total_initial_bg']
+    total_surviving_bg = results['total_surviving_bg']
     
     print("\n=== GENETIC ALGORITHM RESULTS ===")
     print(f"Best Significance: {best_significance:.6f}")
@@ -487,9 +1512,6 @@ def main():
         print(f"  Initial weighted: {stats['initial_weighted']:.6f}")
         print(f"  Surviving weighted: {stats['surviving_weighted']:.6f} ({stats['surviving_weighted']/stats['initial_weighted']*100:.2f}%)")
     
-    total_initial_bg = sum(stats['initial_weighted'] for topology, stats in event_stats.items() if topology != 'signal')
-    total_surviving_bg = sum(stats['surviving_weighted'] for topology, stats in event_stats.items() if topology != 'signal')
-    
     print("\nTotal Background:")
     print(f"  Initial weighted: {total_initial_bg:.6f}")
     print(f"  Surviving weighted: {total_surviving_bg:.6f} ({total_surviving_bg/total_initial_bg*100:.2f}%)")
@@ -500,7 +1522,12 @@ def main():
     print(f"\nExecution time: {int(hours)}h {int(minutes)}m {seconds:.2f}s")
     
     with open('ga_results.txt', 'w') as f:
-        f.write(f"Best Significance: {best_significance:.6f}\n\n")
+        f.write(f"Best Significance: {best_significance:.6f}\n")
+        if 'quantized_significance' in results:
+            f.write(f"Quantized Significance: {results['quantized_significance']:.6f}\n")
+        if 'ga_significance' in results:
+            f.write(f"Significance before refinement: {results['ga_significance']:.6f}\n")
+        f.write("\n")
         f.write("Optimal Thresholds:\n")
         for i, feature in enumerate(signal_df.columns):
             f.write(f"{feature}: {best_individual[i]:.6f}\n")
@@ -524,34 +1551,115 @@ def main():
     
     print("\nOptimal thresholds saved to 'optimal_thresholds.csv'")
     
-    try:
-        print("\n=== CROSS SECTION MEASUREMENT ===")
-        signal_surviving = event_stats['signal']['surviving_weighted']
-        background_surviving = total_surviving_bg
-        
-        print(f"Running cross-section measurement with:")
-        print(f"  Signal events: {signal_surviving:.6f}")
-        print(f"  Background events: {background_surviving:.6f}")
-        
-        import crossSectionMeasurement
-        
-        cross_section_result = crossSectionMeasurement.find_cross_section_HHbbbb(
-            signal_surviving, background_surviving)
-        
+    if not options.no_archive:
+        append_to_archive(options.archive, signal_df.columns, best_individual, best_significance, options.seed)
+        print(f"Optimum appended to '{options.archive}'")
+    
+    if 'cross_section' in results:
+        cross_section = results['cross_section']
         with open('ga_results.txt', 'a') as f:
             f.write("\n\n=== CROSS SECTION MEASUREMENT ===\n")
-            f.write(f"Signal events: {signal_surviving:.6f}\n")
-            f.write(f"Background events: {background_surviving:.6f}\n")
-            f.write(f"Cross section: {cross_section_result['cross_section']:.6f} fb\n")
-            f.write(f"Error (top): {cross_section_result['error_top']:.6f}\n")
-            f.write(f"Error (bottom): {cross_section_result['error_bottom']:.6f}\n")
+            f.write(f"Signal events: {cross_section['signal_events']:.6f}\n")
+            f.write(f"Background events: {cross_section['background_events']:.6f}\n")
+            f.write(f"Cross section: {cross_section['cross_section']:.6f} fb\n")
+            f.write(f"Error (top): {cross_section['error_top']:.6f}\n")
+            f.write(f"Error (bottom): {cross_section['error_bottom']:.6f}\n")
         
         print("\nCross-section measurement completed and results saved to 'ga_results.txt'")
         print(f"Cross-section plot saved to 'analysis/chiSquared.png'")
-        
-    except Exception as e:
-        print(f"\nError running cross-section measurement: {e}")
-        print("Please ensure crossSectionMeasurement.py is in the same directory.")
+    
+    # a finished run must not be picked up by a later --resume
+    checkpoint_file = run_options.get('checkpoint_file')
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+        print(f"Removed the checkpoint {checkpoint_file} of the finished run")
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Optimize the BDTG score thresholds with an island model genetic algorithm')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed for the random number generators (default: unseeded)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Worker processes evaluating the fitness, 1 evaluates in-process (default: all cores)')
+    parser.add_argument('--evaluation', type=str, default='pool', choices=['pool', 'batch', 'bitset', 'kdtree', 'delta'],
+                        help="Fitness evaluation: 'pool' per individual in worker processes, "
+                             "'batch' whole generations with the parallel numba kernel, "
+                             "'bitset' whole generations with a bitset index, "
+                             "'kdtree' whole generations with a k-d tree, "
+                             "'delta' incrementally from the parents' failed-cut counters (default: pool)")
+    parser.add_argument('--quantize', type=int, default=None, choices=[8, 16],
+                        help='Store the scores as 8 or 16 bit bin indices for batch evaluation (default: float64)')
+    parser.add_argument('--index-resolution', type=int, default=256,
+                        help='Threshold levels per feature of the bitset index (default: 256)')
+    parser.add_argument('--index-memory-mb', type=float, default=1024,
+                        help='Largest bitset index to build before falling back to the scan kernel (default: 1024)')
+    parser.add_argument('--leaf-size', type=int, default=64,
+                        help='Largest number of events in a k-d tree leaf (default: 64)')
+    parser.add_argument('--islands', type=str, default='threads', choices=['threads', 'processes'],
+                        help="Run the islands as threads migrating in lockstep, or as processes "
+                             "exchanging migrants asynchronously through queues (default: threads)")
+    parser.add_argument('--optimizer', type=str, default='ga', choices=['ga', 'relaxed'],
+                        help="'ga' runs the island model, 'relaxed' gradient ascent on a sigmoid-smoothed "
+                             "significance from several starts (relaxedCutOptimizer.py) (default: ga)")
+    parser.add_argument('--relaxed-starts', type=int, default=32,
+                        help='Starting points of the relaxed optimizer: the educated guesses, then random ones (default: 32)')
+    parser.add_argument('--relaxed-steps', type=int, default=300,
+                        help='Gradient steps of the relaxed optimizer (default: 300)')
+    parser.add_argument('--no-refine', action='store_true',
+                        help='Skip the coordinate-ascent refinement of the best GA thresholds (cutRefinement.py)')
+    parser.add_argument('--checkpoint', type=str, default=DEFAULT_CHECKPOINT_FILE,
+                        help=f'Checkpoint written after every migration cycle (default: {DEFAULT_CHECKPOINT_FILE})')
+    parser.add_argument('--no-checkpoint', action='store_true',
+                        help='Do not write checkpoints')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue from the checkpoint of an interrupted run with the same settings '
+                             '(removed once a run finishes)')
+    parser.add_argument('--warm-start', action='store_true',
+                        help='Seed the islands with perturbations of previous optima from the archive and '
+                             'optimal_thresholds.csv, in a search box shrunk to their spread')
+    parser.add_argument('--archive', type=str, default=DEFAULT_ARCHIVE_FILE,
+                        help=f'Archive of previous optima, appended to after every run (default: {DEFAULT_ARCHIVE_FILE})')
+    parser.add_argument('--no-archive', action='store_true',
+                        help='Do not append the optimum of this run to the archive')
+    parser.add_argument('--engine', type=str, default='deap', choices=sorted(ENGINES),
+                        help="GA engine: 'deap' evolves lists of DEAP individuals, 'array' evolves each island "
+                             "as a NumPy threshold matrix with vectorized operators (default: deap)")
+    parser.add_argument('--delta-memory-mb', type=float, default=1024,
+                        help='Memory for the failed-cut counter states of the delta evaluator, '
+                             'n_events bytes per individual (default: 1024)')
+    parser.add_argument('--subsample', type=float, default=None,
+                        help='Screen candidates on this fraction of the events of each topology first and '
+                             'evaluate only the most promising on the full statistics (default: off)')
+    parser.add_argument('--promote', type=float, default=0.25,
+                        help='Fraction of the screened candidates evaluated on the full statistics (default: 0.25)')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='Entries of the fitness cache shared by all islands, 0 disables it (default: 0)')
+    parser.add_argument('--cache-decimals', type=int, default=None,
+                        help='Round the thresholds to this many decimals for the cache key (default: exact)')
+    return parser.parse_args(argv)
+
+def ga_options(args):
+    """Keyword arguments of run_optimization for parsed command-line options."""
+    return {
+        'processes': args.processes,
+        'evaluation': args.evaluation,
+        'quantize_bits': args.quantize,
+        'index_resolution': args.index_resolution,
+        'index_memory_mb': args.index_memory_mb,
+        'leaf_size': args.leaf_size,
+        'delta_memory_mb': args.delta_memory_mb,
+        'engine': args.engine,
+        'islands': args.islands,
+        'refine': not args.no_refine,
+        'optimizer': args.optimizer,
+        'relaxed_starts': args.relaxed_starts,
+        'relaxed_steps': args.relaxed_steps,
+        'checkpoint_file': None if args.no_checkpoint else args.checkpoint,
+        'resume': args.resume,
+        'cache_size': args.cache_size,
+        'cache_decimals': args.cache_decimals,
+        'subsample_fraction': args.subsample,
+        'promote_fraction': args.promote
+    }
 
 if __name__ == "__main__":
-    main()
+    main(parse_arguments())
@@ -7,7 +7,7 @@ import argparse
 # fixed luminosity value in fb^-1 for XCC at 380 GeV, 10-years runtime
 LUMINOSITY = 4900.0
 
-def find_cross_section_HHbbbb(HH_remaining, back_remaining, luminosity=LUMINOSITY):
+def find_cross_section_HHbbbb(HH_remaining, back_remaining, luminosity=LUMINOSITY, plot_path=None):
     
     total_remaining = HH_remaining + back_remaining
     
@@ -111,14 +111,16 @@ def find_cross_section_HHbbbb(HH_remaining, back_remaining, luminosity=LUMINOSIT
     # ATLAS style: increase tick label size
     ax.tick_params(axis='both', which='major', labelsize=14)
     
-    # Save plot in the same directory as this script file
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    plot_path = os.path.join(script_dir, 'chiSquared.png')
+    # Save plot in the same directory as this script file unless another path is given
+    if plot_path is None:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        plot_path = os.path.join(script_dir, 'chiSquared.png')
     plt.savefig(plot_path, dpi=300, bbox_inches='tight')
     print(f"Plot saved to: {plot_path}")
     
     # Display the plot on screen
     plt.show()
+    plt.close(fig)
     
     return {
         'cross_section': float(cross_section),
@@ -171,7 +173,7 @@ def parse_arguments():
 if __name__ == "__main__":
     args = parse_arguments()
     
-    result = find_cross_section_HHbbbb(args.hh, args.back)
+    result = find_cross_section_HHbbbb(args.hh, args.back, plot_path=args.output)
     
     print(f"\nFinal Result:")
     print(f"Cross section: {result['cross_section']:.4f} ± {result['error_top']:.4f}/{result['error_bottom']:.4f} fb")
@@ -1,7 +1,18 @@
-from numba import jit
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from numba import config, jit, prange, get_num_threads
+from numba.typed import List
 import numpy as np
 
-@jit(nopython=True)
+# The parallel kernels are launched from the GA island threads. With the TBB layer the
+# interpreter hangs at exit once that has happened, so prefer OpenMP or the workqueue
+# (safe here, kernel calls are serialized by _kernel_lock) unless the user picked a layer.
+if not {'NUMBA_THREADING_LAYER', 'NUMBA_THREADING_LAYER_PRIORITY'} & set(os.environ):
+    config.THREADING_LAYER_PRIORITY = ['omp', 'workqueue', 'tbb']
+
+@jit(nopython=True, cache=True)
 def fast_significance_calculation(thresholds, signal_array, bg_arrays, bg_weights, signal_weight):
 
     n_signal = signal_array.shape[0]
@@ -33,13 +44,14 @@ def fast_significance_calculation(thresholds, signal_array, bg_arrays, bg_weight
     
     return significance
 
-_cached_data = None
+# prepared arrays per (signal_df, background_dfs) pair, keyed by the ids of the frames
+_cached_data = {}
 
 def prepare_data_for_numba(signal_df, background_dfs, weights):
    
-    global _cached_data
+    key = (id(signal_df),) + tuple(id(bg_df) for bg_df in background_dfs.values())
     
-    if _cached_data is None:
+    if key not in _cached_data:
         signal_array = signal_df.values
         
         bg_arrays = []
@@ -51,10 +63,12 @@ def prepare_data_for_numba(signal_df, background_dfs, weights):
         
         signal_weight = weights['signal']
         
-        _cached_data = (signal_array, bg_arrays, np.array(bg_weights), signal_weight)
+        # the frames are kept alive with their arrays so their ids cannot be reused
+        _cached_data[key] = ((signal_df, background_dfs),
+                             (signal_array, bg_arrays, np.array(bg_weights), signal_weight))
         print("Data prepared for optimized calculation")
     
-    return _cached_data
+    return _cached_data[key][1]
 
 def optimized_evaluate(individual, signal_df, background_dfs, weights):
     signal_array, bg_arrays, bg_weights, signal_weight = prepare_data_for_numba(signal_df, background_dfs, weights)
@@ -68,3 +82,694 @@ def optimized_evaluate(individual, signal_df, background_dfs, weights):
     )
     
     return (significance,)
+
+# score tables of a worker process, attached once by attach_score_tables
+_worker_tables = None
+
+def share_score_tables(signal_df, background_dfs, weights):
+    """
+    Write all score tables once into a memory-mapped file that worker processes can attach to.
+    
+    The signal and background scores are stacked into one float64 .npy file (in /dev/shm when
+    available); workers map it read-only, so the page cache is shared and no scores are pickled.
+    
+    Returns:
+        dict: Description of the tables, passed to attach_score_tables and release_score_tables
+    """
+    arrays = [signal_df.values] + [bg_df.values for bg_df in background_dfs.values()]
+    offsets = np.cumsum([0] + [len(array) for array in arrays]).tolist()
+    
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    fd, path = tempfile.mkstemp(suffix='.npy', prefix='ga_scores_', dir=directory)
+    os.close(fd)
+    
+    table = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64,
+                                      shape=(offsets[-1], signal_df.shape[1]))
+    for array, start, stop in zip(arrays, offsets[:-1], offsets[1:]):
+        table[start:stop] = array
+    table.flush()
+    del table
+    
+    return {
+        'path': path,
+        'offsets': offsets,
+        'bg_weights': [weights[bg_type] for bg_type in background_dfs],
+        'signal_weight': weights['signal']
+    }
+
+def attach_score_tables(tables):
+    """Pool initializer: map the shared score tables into this worker."""
+    global _worker_tables
+    
+    table = np.load(tables['path'], mmap_mode='r')
+    offsets = tables['offsets']
+    
+    signal_array = table[offsets[0]:offsets[1]]
+    bg_arrays = List()
+    for start, stop in zip(offsets[1:-1], offsets[2:]):
+        bg_arrays.append(table[start:stop])
+    
+    _worker_tables = (signal_array, bg_arrays, np.array(tables['bg_weights']), tables['signal_weight'])
+
+def release_score_tables(tables):
+    if os.path.exists(tables['path']):
+        os.remove(tables['path'])
+
+def shared_evaluate(individual):
+    """Fitness of one threshold vector against the tables attached by attach_score_tables."""
+    signal_array, bg_arrays, bg_weights, signal_weight = _worker_tables
+    
+    significance = fast_significance_calculation(
+        np.asarray(individual, dtype=np.float64),
+        signal_array,
+        bg_arrays,
+        bg_weights,
+        signal_weight
+    )
+    
+    return (significance,)
+
+@jit(nopython=True, parallel=True, cache=True)
+def batch_significance_calculation(threshold_matrix, events, offsets, segment_weights, n_chunks):
+    """
+    Significance of every row of a (population x features) threshold matrix in one pass.
+    
+    events holds all topologies stacked, segment k spanning rows offsets[k]:offsets[k+1]
+    with weight segment_weights[k]; segment 0 is the signal. The events are split into
+    n_chunks blocks processed in parallel; each event is tested against every candidate,
+    stopping at the first failed cut, and only per-block counters are written.
+    """
+    n_pop = threshold_matrix.shape[0]
+    n_features = threshold_matrix.shape[1]
+    n_events = events.shape[0]
+    n_segments = offsets.shape[0] - 1
+    
+    counts = np.zeros((n_chunks, n_pop, n_segments), dtype=np.int64)
+    
+    for c in prange(n_chunks):
+        start = c * n_events // n_chunks
+        stop = (c + 1) * n_events // n_chunks
+        
+        segment = 0
+        while segment < n_segments - 1 and offsets[segment + 1] <= start:
+            segment += 1
+        
+        for e in range(start, stop):
+            while e >= offsets[segment + 1]:
+                segment += 1
+            for p in range(n_pop):
+                passed = True
+                for i in range(n_features):
+                    if not (events[e, i] > threshold_matrix[p, i]):
+                        passed = False
+                        break
+                if passed:
+                    counts[c, p, segment] += 1
+    
+    significances = np.zeros(n_pop)
+    for p in range(n_pop):
+        surviving = np.zeros(n_segments, dtype=np.int64)
+        for c in range(n_chunks):
+            for k in range(n_segments):
+                surviving[k] += counts[c, p, k]
+        
+        surviving_signal = surviving[0] * segment_weights[0]
+        total_surviving_background = 0.0
+        for k in range(1, n_segments):
+            total_surviving_background += surviving[k] * segment_weights[k]
+        
+        if surviving_signal + total_surviving_background > 0:
+            significances[p] = surviving_signal / np.sqrt(surviving_signal + total_surviving_background)
+    
+    return significances
+
+# numba's default workqueue threading layer cannot run parallel kernels from several
+# threads at once, and the GA islands are threads
+_kernel_lock = threading.Lock()
+
+def prepare_event_table(signal_df, background_dfs, weights):
+    """
+    Stack the signal and background scores into one contiguous table for the batched kernel.
+    
+    Returns:
+        dict: events (n_events x n_features), offsets and segment_weights (signal first)
+    """
+    arrays = [signal_df.values] + [bg_df.values for bg_df in background_dfs.values()]
+    
+    return {
+        'events': np.ascontiguousarray(np.vstack(arrays), dtype=np.float64),
+        'offsets': np.cumsum([0] + [len(array) for array in arrays]).astype(np.int64),
+        'segment_weights': np.array([weights['signal']] + [weights[bg_type] for bg_type in background_dfs])
+    }
+
+# storage types of the quantized scores, keyed by the number of bits per score
+QUANTIZED_DTYPES = {8: np.uint8, 16: np.uint16}
+
+def quantize_scores(scores, levels):
+    # bin index floor(score * levels), scores are BDTG outputs in [0, 1]
+    return np.floor(np.clip(scores, 0.0, 1.0) * levels)
+
+def snap_thresholds(thresholds, levels):
+    """
+    Float thresholds passing exactly the scores the quantized cuts pass.
+    
+    A quantized cut t passes the scores with floor(s * levels) > floor(t * levels). The
+    snapped threshold is the largest float whose bin is still floor(t * levels), so that
+    s > snapped holds for the same scores, including the rounding of s * levels.
+    """
+    bins = quantize_scores(np.asarray(thresholds, dtype=np.float64), levels)
+    snapped = (bins + 1) / levels
+    # a few ulps down while the candidate already is in the next bin, then up while the next float is not
+    while True:
+        too_high = np.floor(snapped * levels) > bins
+        if not too_high.any():
+            break
+        snapped = np.where(too_high, np.nextafter(snapped, -np.inf), snapped)
+    while True:
+        step = np.nextafter(snapped, np.inf)
+        too_low = np.floor(step * levels) <= bins
+        if not too_low.any():
+            break
+        snapped = np.where(too_low, step, snapped)
+    # above the last bin nothing passes either way, and no score exceeds 1
+    return np.minimum(snapped, 1.0)
+
+def quantize_event_table(table, bits=16):
+    """
+    Compact copy of an event table with every score stored as a uint16 (or uint8) bin index.
+    
+    A score s passes a threshold t when floor(s * L) > floor(t * L), with L = 2**bits - 1,
+    i.e. the cut is the float cut with t snapped to the bin grid. This keeps the working set
+    4x (uint16) or 8x (uint8) smaller than the float64 table.
+    
+    Returns:
+        dict: Same keys as prepare_event_table plus 'levels'
+    """
+    if bits not in QUANTIZED_DTYPES:
+        raise ValueError(f"Unsupported quantization: {bits} bits (use {', '.join(map(str, QUANTIZED_DTYPES))})")
+    levels = 2**bits - 1
+    
+    return {
+        'events': np.ascontiguousarray(quantize_scores(table['events'], levels).astype(QUANTIZED_DTYPES[bits])),
+        'offsets': table['offsets'],
+        'segment_weights': table['segment_weights'],
+        'levels': levels
+    }
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+_ALL_BITS = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+@jit(nopython=True, cache=True)
+def _popcount64(x):
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return (x * _H01) >> np.uint64(56)
+
+@jit(nopython=True, cache=True)
+def _fill_bitset_index(events_q, offsets, word_offsets, index):
+    n_features = index.shape[0]
+    resolution = index.shape[1]
+    n_words = index.shape[2]
+    n_segments = offsets.shape[0] - 1
+    
+    for i in range(n_features):
+        # set each event in the highest level it passes, q - 1 ...
+        for k in range(n_segments):
+            for e in range(offsets[k], offsets[k + 1]):
+                q = events_q[e, i]
+                if q > 0:
+                    local = e - offsets[k]
+                    w = word_offsets[k] + local // 64
+                    index[i, q - 1, w] |= np.uint64(1) << np.uint64(local % 64)
+        # ... then every level also holds the events passing all higher levels
+        for level in range(resolution - 2, -1, -1):
+            for w in range(n_words):
+                index[i, level, w] |= index[i, level + 1, w]
+
+@jit(nopython=True, parallel=True, cache=True)
+def bitset_significance_calculation(level_matrix, index, word_offsets, segment_weights):
+    """
+    Significance of every row of a (population x features) matrix of threshold levels using
+    a bitset index: per background segment, the bitsets of the 12 cuts are ANDed word by word
+    and the surviving events counted with popcounts.
+    """
+    n_pop = level_matrix.shape[0]
+    n_features = level_matrix.shape[1]
+    resolution = index.shape[1]
+    n_segments = word_offsets.shape[0] - 1
+    
+    significances = np.zeros(n_pop)
+    
+    for p in prange(n_pop):
+        empty = False
+        for i in range(n_features):
+            if level_matrix[p, i] >= resolution:
+                empty = True
+        if empty:
+            continue
+        
+        surviving_signal = 0.0
+        total_surviving_background = 0.0
+        for k in range(n_segments):
+            count = 0
+            for w in range(word_offsets[k], word_offsets[k + 1]):
+                word = _ALL_BITS
+                for i in range(n_features):
+                    word &= index[i, level_matrix[p, i], w]
+                    if word == 0:
+                        break
+                count += _popcount64(word)
+            if k == 0:
+                surviving_signal = count * segment_weights[0]
+            else:
+                total_surviving_background += count * segment_weights[k]
+        
+        if surviving_signal + total_surviving_background > 0:
+            significances[p] = surviving_signal / np.sqrt(surviving_signal + total_surviving_background)
+    
+    return significances
+
+def build_bitset_index(table, resolution=256, memory_mb=1024):
+    """
+    Precompute, for every feature and threshold level, a packed bitset of the events passing it.
+    
+    Level l of a feature holds the events with floor(score * resolution) > l, so a threshold t
+    is evaluated at level floor(t * resolution), like a quantized table with that many levels.
+    Each background segment starts on a 64-bit word boundary so it can be counted separately.
+    
+    Args:
+        table (dict): Float table from prepare_event_table
+        resolution (int): Number of threshold levels per feature
+        memory_mb (float): Largest index to build, in MB
+        
+    Returns:
+        dict: Index table for population_significance, or None if it would exceed memory_mb
+    """
+    offsets = table['offsets']
+    segment_words = [(stop - start + 63) // 64 for start, stop in zip(offsets[:-1], offsets[1:])]
+    word_offsets = np.cumsum([0] + segment_words).astype(np.int64)
+    n_features = table['events'].shape[1]
+    
+    size_mb = n_features * resolution * word_offsets[-1] * 8 / 1e6
+    if size_mb > memory_mb:
+        print(f"Bitset index would need {size_mb:.0f} MB (cap {memory_mb:.0f} MB), not building it")
+        return None
+    
+    index = np.zeros((n_features, resolution, word_offsets[-1]), dtype=np.uint64)
+    events_q = quantize_scores(table['events'], resolution).astype(np.int64)
+    _fill_bitset_index(events_q, offsets, word_offsets, index)
+    print(f"Built bitset index: {n_features} features x {resolution} levels ({size_mb:.1f} MB)")
+    
+    return {
+        'index': index,
+        'word_offsets': word_offsets,
+        'offsets': offsets,
+        'segment_weights': table['segment_weights'],
+        'levels': resolution
+    }
+
+@jit(nopython=True, cache=True)
+def _build_kdtree(events, leaf_size, max_nodes):
+    n_events = events.shape[0]
+    n_features = events.shape[1]
+    
+    order = np.arange(n_events)
+    node_start = np.zeros(max_nodes, dtype=np.int64)
+    node_stop = np.zeros(max_nodes, dtype=np.int64)
+    node_left = np.full(max_nodes, -1, dtype=np.int64)
+    node_right = np.full(max_nodes, -1, dtype=np.int64)
+    node_lo = np.zeros((max_nodes, n_features))
+    node_hi = np.zeros((max_nodes, n_features))
+    
+    n_nodes = 1
+    node_stop[0] = n_events
+    stack = np.zeros(max_nodes, dtype=np.int64)
+    depth = 1
+    
+    while depth > 0:
+        depth -= 1
+        node = stack[depth]
+        start = node_start[node]
+        stop = node_stop[node]
+        
+        # tight bounding box of the events below this node
+        for i in range(n_features):
+            lo = np.inf
+            hi = -np.inf
+            for j in range(start, stop):
+                value = events[order[j], i]
+                lo = min(lo, value)
+                hi = max(hi, value)
+            node_lo[node, i] = lo
+            node_hi[node, i] = hi
+        
+        if stop - start <= leaf_size:
+            continue
+        
+        # median split along the widest dimension
+        split_feature = 0
+        for i in range(1, n_features):
+            if node_hi[node, i] - node_lo[node, i] > node_hi[node, split_feature] - node_lo[node, split_feature]:
+                split_feature = i
+        if node_hi[node, split_feature] == node_lo[node, split_feature]:
+            continue
+        
+        members = order[start:stop].copy()
+        members = members[np.argsort(events[members, split_feature], kind='mergesort')]
+        order[start:stop] = members
+        middle = start + (stop - start) // 2
+        
+        node_left[node] = n_nodes
+        node_right[node] = n_nodes + 1
+        node_start[n_nodes] = start
+        node_stop[n_nodes] = middle
+        node_start[n_nodes + 1] = middle
+        node_stop[n_nodes + 1] = stop
+        stack[depth] = n_nodes
+        stack[depth + 1] = n_nodes + 1
+        depth += 2
+        n_nodes += 2
+    
+    return (order, node_start[:n_nodes], node_stop[:n_nodes], node_left[:n_nodes],
+            node_right[:n_nodes], node_lo[:n_nodes], node_hi[:n_nodes])
+
+@jit(nopython=True, cache=True)
+def _count_kdtree_nodes(segments, node_start, node_stop, node_left, node_right, n_segments):
+    n_nodes = node_start.shape[0]
+    node_counts = np.zeros((n_nodes, n_segments), dtype=np.int64)
+    
+    # children always have higher ids than their parent
+    for node in range(n_nodes - 1, -1, -1):
+        if node_left[node] < 0:
+            for j in range(node_start[node], node_stop[node]):
+                node_counts[node, segments[j]] += 1
+        else:
+            for k in range(n_segments):
+                node_counts[node, k] = node_counts[node_left[node], k] + node_counts[node_right[node], k]
+    
+    return node_counts
+
+@jit(nopython=True, parallel=True, cache=True)
+def kdtree_significance_calculation(threshold_matrix, events, segments, node_start, node_stop,
+                                    node_left, node_right, node_lo, node_hi, node_counts,
+                                    segment_weights):
+    """
+    Significance of every row of a (population x features) threshold matrix using a k-d tree.
+    
+    A node whose bounding box lies entirely above the thresholds contributes its per-segment
+    counts at once, a node whose box fails any cut is dropped, and only leaves straddling the
+    threshold corner are scanned event by event.
+    """
+    n_pop = threshold_matrix.shape[0]
+    n_features = threshold_matrix.shape[1]
+    n_segments = node_counts.shape[1]
+    
+    significances = np.zeros(n_pop)
+    
+    for p in prange(n_pop):
+        surviving = np.zeros(n_segments, dtype=np.int64)
+        # depth-first, at most one pending sibling per level of the (balanced) tree
+        stack = np.zeros(128, dtype=np.int64)
+        depth = 1
+        
+        while depth > 0:
+            depth -= 1
+            node = stack[depth]
+            
+            accepted = True
+            rejected = False
+            for i in range(n_features):
+                if not (node_hi[node, i] > threshold_matrix[p, i]):
+                    rejected = True
+                    break
+                if not (node_lo[node, i] > threshold_matrix[p, i]):
+                    accepted = False
+            if rejected:
+                continue
+            
+            if accepted:
+                for k in range(n_segments):
+                    surviving[k] += node_counts[node, k]
+            elif node_left[node] >= 0:
+                stack[depth] = node_left[node]
+                stack[depth + 1] = node_right[node]
+                depth += 2
+            else:
+                for e in range(node_start[node], node_stop[node]):
+                    passed = True
+                    for i in range(n_features):
+                        if not (events[e, i] > threshold_matrix[p, i]):
+                            passed = False
+                            break
+                    if passed:
+                        surviving[segments[e]] += 1
+        
+        surviving_signal = surviving[0] * segment_weights[0]
+        total_surviving_background = 0.0
+        for k in range(1, n_segments):
+            total_surviving_background += surviving[k] * segment_weights[k]
+        
+        if surviving_signal + total_surviving_background > 0:
+            significances[p] = surviving_signal / np.sqrt(surviving_signal + total_surviving_background)
+    
+    return significances
+
+def build_kdtree_index(table, leaf_size=64):
+    """
+    Build a k-d tree over all events of a table with per-node event counts of every topology.
+    
+    The fitness is a weighted orthant-dominance count (events whose every score exceeds the
+    threshold vector), so whole subtrees can be accepted or rejected from their bounding
+    boxes. Counts are exact, the results match the scan kernel.
+    
+    Args:
+        table (dict): Float table from prepare_event_table
+        leaf_size (int): Largest number of events in a leaf
+        
+    Returns:
+        dict: Index table for population_significance
+    """
+    events = table['events']
+    offsets = table['offsets']
+    n_segments = len(offsets) - 1
+    
+    leaf_size = max(1, leaf_size)
+    max_nodes = 2 * (2 * len(events) // leaf_size + 1)
+    order, node_start, node_stop, node_left, node_right, node_lo, node_hi = _build_kdtree(
+        events, leaf_size, max_nodes)
+    
+    # events and their topology in tree order, so every leaf is a contiguous block
+    segments = np.repeat(np.arange(n_segments), np.diff(offsets))[order]
+    node_counts = _count_kdtree_nodes(segments, node_start, node_stop, node_left, node_right, n_segments)
+    print(f"Built k-d tree: {len(node_start)} nodes over {len(events)} events (leaf size {leaf_size})")
+    
+    return {
+        'events': np.ascontiguousarray(events[order]),
+        'segments': segments,
+        'node_start': node_start,
+        'node_stop': node_stop,
+        'node_left': node_left,
+        'node_right': node_right,
+        'node_lo': node_lo,
+        'node_hi': node_hi,
+        'node_counts': node_counts,
+        'offsets': offsets,
+        'segment_weights': table['segment_weights']
+    }
+
+@jit(nopython=True, cache=True)
+def _fail_counts(events, thresholds, segments, n_segments):
+    n_events = events.shape[0]
+    n_features = events.shape[1]
+    fails = np.zeros(n_events, dtype=np.int8)
+    counts = np.zeros(n_segments, dtype=np.int64)
+    
+    for e in range(n_events):
+        failed = 0
+        for i in range(n_features):
+            if not (events[e, i] > thresholds[i]):
+                failed += 1
+        fails[e] = failed
+        if failed == 0:
+            counts[segments[e]] += 1
+    
+    return fails, counts
+
+@jit(nopython=True, cache=True)
+def _apply_threshold_delta(fails, counts, segments, sorted_order, old_ranks, new_ranks):
+    # rank = number of events failing the cut; in sorted order the events
+    # between the old and the new rank are the only ones changing status
+    n_features = sorted_order.shape[0]
+    touched = 0
+    
+    for i in range(n_features):
+        a = old_ranks[i]
+        b = new_ranks[i]
+        if b > a:
+            for j in range(a, b):
+                e = sorted_order[i, j]
+                if fails[e] == 0:
+                    counts[segments[e]] -= 1
+                fails[e] += 1
+            touched += b - a
+        elif b < a:
+            for j in range(b, a):
+                e = sorted_order[i, j]
+                fails[e] -= 1
+                if fails[e] == 0:
+                    counts[segments[e]] += 1
+            touched += a - b
+    
+    return touched
+
+# upper bound on the counter states kept by DeltaEvaluator: a few times the 5 x 100 individuals
+# of the default island model, so the linear nearest-state search stays cheap on small tables
+DELTA_MAX_STATES = 2048
+
+class DeltaEvaluator:
+    """
+    Incremental fitness evaluation from the per-event failed-cut counters of earlier individuals.
+    
+    For every evaluated individual the number of failed cuts of each event is kept (LRU,
+    n_events bytes each, up to memory_mb and max_states). A new individual starts from the stored state
+    closest in event ranks, usually the parent it was cloned from, and only the events whose
+    score lies between the old and the new threshold of a changed feature are updated.
+    When that band is larger than the table (many genes moved far, or no state yet) the
+    counters are recomputed with a full scan. Results are exact.
+    
+    Args:
+        table (dict): Float table from prepare_event_table
+        memory_mb (float): Memory for the stored counter states, in MB
+        max_states (int): Maximum number of stored counter states
+    """
+    
+    def __init__(self, table, memory_mb=1024, max_states=DELTA_MAX_STATES):
+        events = table['events']
+        n_segments = len(table['offsets']) - 1
+        
+        self.events = events
+        self.segments = np.repeat(np.arange(n_segments), np.diff(table['offsets']))
+        self.n_segments = n_segments
+        self.segment_weights = table['segment_weights']
+        
+        index_dtype = np.int32 if len(events) < 2**31 else np.int64
+        self.sorted_order = np.ascontiguousarray(np.argsort(events, axis=0, kind='stable').T.astype(index_dtype))
+        self.sorted_values = np.ascontiguousarray(np.take_along_axis(events, self.sorted_order.T, axis=0).T)
+        
+        # states live in slots; unused slots are out of reach of the nearest-state search
+        self.max_states = max(1, min(int(max_states), int(memory_mb * 1e6 // max(len(events), 1))))
+        self.slot_ranks = np.full((self.max_states, events.shape[1]), 2 * len(events) + 1, dtype=np.int64)
+        self.slot_fails = [None] * self.max_states
+        self.slot_counts = [None] * self.max_states
+        self.slot_keys = [None] * self.max_states
+        self.slots = OrderedDict()
+        self.lock = threading.Lock()
+        
+        self.n_full = 0
+        self.n_delta = 0
+        self.touched_events = 0
+    
+    def ranks(self, thresholds):
+        return np.array([np.searchsorted(self.sorted_values[i], thresholds[i], side='right')
+                         for i in range(len(thresholds))], dtype=np.int64)
+    
+    def significance(self, counts):
+        surviving_signal = counts[0] * self.segment_weights[0]
+        total_surviving_background = 0.0
+        for k in range(1, self.n_segments):
+            total_surviving_background += counts[k] * self.segment_weights[k]
+        
+        if surviving_signal + total_surviving_background > 0:
+            return surviving_signal / np.sqrt(surviving_signal + total_surviving_background)
+        return 0.0
+    
+    def evaluate(self, thresholds):
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        key = thresholds.tobytes()
+        
+        with self.lock:
+            if key in self.slots:
+                self.slots.move_to_end(key)
+                return self.significance(self.slot_counts[self.slots[key]])
+            
+            ranks = self.ranks(thresholds)
+            distances = np.abs(self.slot_ranks - ranks).sum(axis=1)
+            base = int(np.argmin(distances))
+            
+            if distances[base] < len(self.events):
+                self.slots.move_to_end(self.slot_keys[base])
+                fails = self.slot_fails[base].copy()
+                counts = self.slot_counts[base].copy()
+                self.touched_events += _apply_threshold_delta(fails, counts, self.segments, self.sorted_order,
+                                                              self.slot_ranks[base], ranks)
+                self.n_delta += 1
+            else:
+                fails, counts = _fail_counts(self.events, thresholds, self.segments, self.n_segments)
+                self.n_full += 1
+            
+            if len(self.slots) < self.max_states:
+                slot = len(self.slots)
+            else:
+                _, slot = self.slots.popitem(last=False)
+            self.slots[key] = slot
+            self.slot_keys[slot] = key
+            self.slot_ranks[slot] = ranks
+            self.slot_fails[slot] = fails
+            self.slot_counts[slot] = counts
+            
+            return self.significance(counts)
+    
+    def summary(self):
+        n_delta = max(self.n_delta, 1)
+        return (f"Delta evaluation: {self.n_delta} incremental, {self.n_full} full, "
+                f"{self.touched_events / n_delta:.0f} events updated per incremental evaluation "
+                f"(of {len(self.events)})")
+
+def population_significance(threshold_matrix, table):
+    """
+    Significances of all rows of threshold_matrix against a table from prepare_event_table,
+    quantize_event_table, build_bitset_index or build_kdtree_index; for quantized tables and
+    bitset indices the thresholds are snapped to their grid.
+    """
+    if 'levels' in table:
+        threshold_matrix = quantize_scores(np.asarray(threshold_matrix, dtype=np.float64),
+                                           table['levels']).astype(np.int64)
+    threshold_matrix = np.ascontiguousarray(threshold_matrix)
+    
+    if 'index' in table:
+        with _kernel_lock:
+            return bitset_significance_calculation(
+                threshold_matrix,
+                table['index'],
+                table['word_offsets'],
+                table['segment_weights']
+            )
+    if 'node_counts' in table:
+        with _kernel_lock:
+            return kdtree_significance_calculation(
+                threshold_matrix,
+                table['events'],
+                table['segments'],
+                table['node_start'],
+                table['node_stop'],
+                table['node_left'],
+                table['node_right'],
+                table['node_lo'],
+                table['node_hi'],
+                table['node_counts'],
+                table['segment_weights']
+            )
+    n_chunks = max(1, min(len(table['events']), 4 * get_num_threads()))
+    
+    with _kernel_lock:
+        return batch_significance_calculation(
+            threshold_matrix,
+            table['events'],
+            table['offsets'],
+            table['segment_weights'],
+            n_chunks
+        )
@@ -0,0 +1,349 @@
+import os
+import sys
+import json
+import time
+import shlex
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FEATURE_EXTRACTION_DIR = os.path.join(SCRIPT_DIR, '..', 'featureExtraction')
+
+DEFAULT_CACHE_FILE = '.pipeline_cache.json'
+
+# topologies expected by BDTGs.main, in the order of its background_files
+TOPOLOGIES = [
+    'signal',
+    'Bqq', 'Btt', 'BZZ', 'BWW',
+    'BqqX', 'BqqqqX', 'BqqHX', 'BZH',
+    'Bpebb', 'Bpebbqq', 'BpeqqH', 'Bpett'
+]
+
+# binary stores written by TTree2csv.py, preferred by BDTGs.load_data over the CSV file
+FEATURE_STORE_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'npy': '_npy'}
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    A stage is skipped when the fingerprint of its command and input contents matches the
+    one recorded after its last successful run and its outputs are still unchanged on disk.
+    Stages that consume another stage's outputs run after it; all others may run concurrently.
+
+    Args:
+        name (str): Unique stage name
+        command (list): Command run with subprocess
+        inputs (list): Files or directories the stage reads (data and code)
+        outputs (list): Files or directories the stage writes
+    """
+
+    def __init__(self, name, command, inputs, outputs):
+        self.name = name
+        self.command = command
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.dependencies = set()
+
+class ContentHasher:
+    """SHA-256 of files and directories, memoized on (size, mtime) so unchanged inputs are not re-read."""
+
+    def __init__(self, memo=None):
+        self.memo = memo or {}
+
+    def _hash_file(self, path):
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        entry = self.memo.get(path)
+        if entry is not None and entry['signature'] == signature:
+            return entry['hash']
+
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        self.memo[path] = {'signature': signature, 'hash': digest}
+        return digest
+
+    def hash(self, path):
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            return None
+        if os.path.isdir(path):
+            h = hashlib.sha256()
+            for name in sorted(os.listdir(path)):
+                h.update(name.encode())
+                h.update((self.hash(os.path.join(path, name)) or '').encode())
+            return h.hexdigest()
+        return self._hash_file(path)
+
+def stage_fingerprint(stage, hasher):
+    h = hashlib.sha256()
+    h.update(json.dumps(stage.command).encode())
+    for path in stage.inputs:
+        h.update(path.encode())
+        h.update((hasher.hash(path) or 'missing').encode())
+    return h.hexdigest()
+
+def resolve_dependencies(stages):
+    producers = {}
+    for stage in stages:
+        for path in stage.outputs:
+            producers[os.path.abspath(path)] = stage.name
+
+    for stage in stages:
+        for path in stage.inputs:
+            producer = producers.get(os.path.abspath(path))
+            if producer is not None and producer != stage.name:
+                stage.dependencies.add(producer)
+
+def load_cache(cache_file):
+    if not os.path.exists(cache_file):
+        return {'stages': {}, 'files': {}}
+    with open(cache_file) as f:
+        return json.load(f)
+
+def save_cache(cache, cache_file):
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_file, cache_file)
+
+def is_up_to_date(stage, fingerprint, cache, hasher):
+    record = cache['stages'].get(stage.name)
+    if record is None or record['fingerprint'] != fingerprint:
+        return False
+    return all(hasher.hash(path) == record['outputs'].get(path) for path in stage.outputs)
+
+def run_stage(stage):
+    print(f"[{stage.name}] running: {' '.join(stage.command)}")
+    start_time = time.time()
+    subprocess.run(stage.command, check=True)
+    return time.time() - start_time
+
+def run_pipeline(stages, cache_file=DEFAULT_CACHE_FILE, workers=None, force=(), dry_run=False):
+    """
+    Run the stages in dependency order, skipping the ones whose inputs are unchanged.
+
+    Independent stages run concurrently in up to `workers` threads, each executing its
+    command as a subprocess.
+
+    Args:
+        stages (list): Stage objects
+        cache_file (str): JSON file with the fingerprints of the last successful runs
+        workers (int): Maximum number of stages running at once (default: number of cores)
+        force (iterable): Stage names to rerun regardless of the cache ('all' for every stage)
+        dry_run (bool): Only report which stages would run
+
+    Returns:
+        dict: Stage name -> 'cached', 'ran', 'failed', 'skipped' or 'would run'
+    """
+    resolve_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    cache = load_cache(cache_file)
+    hasher = ContentHasher(cache.get('files'))
+    force = set(force)
+
+    status = {}
+    remaining = set(by_name)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        while remaining or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for name in sorted(remaining):
+                    stage = by_name[name]
+                    if not all(dep in status for dep in stage.dependencies):
+                        continue
+
+                    remaining.discard(name)
+                    progressed = True
+                    dependency_status = {status[dep] for dep in stage.dependencies}
+
+                    if dependency_status & {'failed', 'skipped'}:
+                        print(f"[{name}] skipped, a dependency failed")
+                        status[name] = 'skipped'
+                        continue
+
+                    fingerprint = stage_fingerprint(stage, hasher)
+                    forced = name in force or 'all' in force or 'would run' in dependency_status
+
+                    if not forced and is_up_to_date(stage, fingerprint, cache, hasher):
+                        print(f"[{name}] up to date, skipping")
+                        status[name] = 'cached'
+                    elif dry_run:
+                        print(f"[{name}] would run: {' '.join(stage.command)}")
+                        status[name] = 'would run'
+                    else:
+                        running[executor.submit(run_stage, stage)] = (stage, fingerprint)
+
+            if not running:
+                if remaining:
+                    # only reachable with a dependency cycle
+                    raise RuntimeError(f"Cannot schedule stages: {', '.join(sorted(remaining))}")
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, fingerprint = running.pop(future)
+                try:
+                    elapsed = future.result()
+                except Exception as e:
+                    print(f"[{stage.name}] failed: {e}")
+                    status[stage.name] = 'failed'
+                    cache['stages'].pop(stage.name, None)
+                    continue
+
+                print(f"[{stage.name}] finished in {elapsed:.1f}s")
+                status[stage.name] = 'ran'
+                if set(stage.inputs) & set(stage.outputs):
+                    # files the stage updates itself (the GA threshold archive) are fingerprinted as
+                    # it left them, so only changes made by others invalidate it
+                    fingerprint = stage_fingerprint(stage, hasher)
+                cache['stages'][stage.name] = {
+                    'fingerprint': fingerprint,
+                    'outputs': {path: hasher.hash(path) for path in stage.outputs},
+                    'finished': time.strftime("%Y-%m-%d %H:%M:%S")
+                }
+                cache['files'] = hasher.memo
+                save_cache(cache, cache_file)
+
+    cache['files'] = hasher.memo
+    if not dry_run:
+        save_cache(cache, cache_file)
+
+    return status
+
+def feature_table_path(name, output_format, directory='.'):
+    return os.path.join(directory, name + FEATURE_STORE_EXTENSIONS[output_format])
+
+def existing_feature_table(name, directory='.'):
+    # same preference order as BDTGs.find_feature_store, then the CSV file
+    for output_format in ('parquet', 'npy', 'csv'):
+        path = feature_table_path(name, output_format, directory)
+        if os.path.exists(path):
+            return path
+    return feature_table_path(name, 'csv', directory)
+
+def ga_state_files(ga_args=()):
+    """
+    Files GA.py reads and writes besides the predictions and its results, for its GA.py arguments.
+
+    The threshold archive is appended to by every run unless --no-archive is given, and read
+    together with optimal_thresholds.csv with --warm-start; the checkpoint is written during
+    the run (and removed when it finishes) unless --no-checkpoint is given.
+
+    Returns:
+        tuple: (extra inputs, extra outputs)
+    """
+    # the defaults of GA.parse_arguments, without importing GA and numba here
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--archive', type=str, default='threshold_archive.csv')
+    parser.add_argument('--no-archive', action='store_true')
+    parser.add_argument('--warm-start', action='store_true')
+    parser.add_argument('--checkpoint', type=str, default='ga_checkpoint.pkl')
+    parser.add_argument('--no-checkpoint', action='store_true')
+    args, _ = parser.parse_known_args(list(ga_args))
+
+    inputs = [args.archive, 'optimal_thresholds.csv'] if args.warm_start else []
+    outputs = []
+    if not args.no_archive:
+        outputs.append(args.archive)
+    if not args.no_checkpoint:
+        outputs.append(args.checkpoint)
+    return inputs, outputs
+
+def build_default_pipeline(manifest=None, output_format='csv', bdtg_args=(), ga_args=()):
+    """
+    Declare the stages of the full analysis.
+
+    TTree2csv (one stage per topology of the manifest) -> BDTGs (load_data, train_bdtg_models,
+    apply_models) -> GA (GA.main, which also runs the cross-section measurement).
+    Without a manifest the feature tables already in the working directory are the inputs.
+    """
+    python = sys.executable
+    stages = []
+    feature_tables = []
+
+    if manifest is not None:
+        tree2csv = os.path.join(FEATURE_EXTRACTION_DIR, 'TTree2csv.py')
+        for name, entry in manifest.items():
+            # BDTGs.main reads the tables from the working directory
+            output = feature_table_path(name, output_format)
+            stages.append(Stage(
+                f'export_{name}',
+                [python, tree2csv, '--input', entry['root_file'], '--tree', entry['tree'],
+                 '--output', os.path.splitext(output)[0] + '.csv', '--format', output_format],
+                inputs=[entry['root_file'], tree2csv],
+                outputs=[output]
+            ))
+            feature_tables.append(output)
+    else:
+        feature_tables = [existing_feature_table(name) for name in TOPOLOGIES]
+
+    predictions = [f'{name}_predictions.csv' for name in TOPOLOGIES]
+
+    stages.append(Stage(
+        'bdtg',
+        [python, os.path.join(SCRIPT_DIR, 'BDTGs.py')] + list(bdtg_args),
+        inputs=feature_tables + [os.path.join(SCRIPT_DIR, 'BDTGs.py')],
+        outputs=predictions
+    ))
+
+    ga_inputs, ga_outputs = ga_state_files(ga_args)
+    stages.append(Stage(
+        'ga',
+        [python, os.path.join(SCRIPT_DIR, 'GA.py')] + list(ga_args),
+        inputs=predictions + ga_inputs + [os.path.join(SCRIPT_DIR, name) for name in
+                                          ('GA.py', 'numba_optimization.py', 'cutRefinement.py',
+                                           'relaxedCutOptimizer.py', 'crossSectionMeasurement.py')],
+        outputs=['ga_results.txt', 'optimal_thresholds.csv'] + ga_outputs
+    ))
+
+    return stages
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Run the analysis pipeline, skipping stages whose inputs are unchanged')
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='JSON manifest of the TTree conversions (see featureExtraction/convertAllTopologies.py); '
+                             'without it the existing feature tables are used')
+    parser.add_argument('--format', type=str, default='csv', choices=sorted(FEATURE_STORE_EXTENSIONS),
+                        help='Feature table format written by the export stages (default: csv)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Maximum number of stages running at once (default: number of cores)')
+    # values starting with a dash must be attached with '=', e.g. --bdtg-args=--no-registry,
+    # otherwise argparse reads them as options of this script
+    parser.add_argument('--bdtg-args', type=str, default='',
+                        help='Extra arguments for BDTGs.py, attached with = since they start with a dash, '
+                             'e.g. --bdtg-args="--parallel-models 8 --no-registry"')
+    parser.add_argument('--ga-args', type=str, default='',
+                        help='Extra arguments for GA.py, attached with =, e.g. --ga-args="--evaluation kdtree"')
+    parser.add_argument('--force', type=str, nargs='*', default=[],
+                        help="Stages to rerun even if up to date ('all' for every stage)")
+    parser.add_argument('--cache-file', type=str, default=DEFAULT_CACHE_FILE,
+                        help=f'Stage cache file (default: {DEFAULT_CACHE_FILE})')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only show which stages would run')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    manifest = None
+    if args.manifest is not None:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+
+    stages = build_default_pipeline(manifest, args.format, shlex.split(args.bdtg_args), shlex.split(args.ga_args))
+
+    start_time = time.time()
+    status = run_pipeline(stages, args.cache_file, args.workers, args.force, args.dry_run)
+
+    print("\n=== PIPELINE SUMMARY ===")
+    for name, stage_status in status.items():
+        print(f"{name}: {stage_status}")
+    print(f"\nTotal execution time: {time.time() - start_time:.1f}s")
@@ -5,6 +5,10 @@ import pandas as pd
 import numpy as np
 import time
 import argparse
+import shlex
+import json
+import random
+import multiprocessing
 from datetime import datetime
 
 def run_bdtg_training():
@@ -23,13 +27,13 @@ def run_bdtg_training():
         print(f"Unexpected error during BDTG training: {e}")
         return False
 
-def run_ga_optimization():
+def run_ga_optimization(ga_args=()):
     print("\n=== Running Genetic Algorithm Optimization ===")
     try:
         current_dir = os.path.dirname(os.path.abspath(__file__))
         ga_script = os.path.join(current_dir, "GA.py")
         
-        subprocess.run([sys.executable, ga_script], check=True)
+        subprocess.run([sys.executable, ga_script, *ga_args], check=True)
         
         results_file = os.path.join(current_dir, "ga_results.txt")
         
@@ -51,7 +55,8 @@ def run_ga_optimization():
             for line in lines:
                 if ': ' in line:
                     key, value = line.split(': ', 1)
-                    key = key.strip().lower().replace(' ', '_')
+                    # "Error (top)" -> error_top, the key of the in-process results
+                    key = key.strip().lower().replace('(', '').replace(')', '').replace(' ', '_')
                     try:
                         cross_section_data[key] = float(value.split()[0])
                     except ValueError:
@@ -81,6 +86,213 @@ def run_ga_optimization():
         print(f"Unexpected error during GA optimization: {e}")
         return None
 
+# prediction tables of the in-process GA workers, set once per worker by _init_ga_worker
+_worker_data = None
+
+# default batch of an adaptive study: a quarter of the workers, so the precision is checked
+# several times before the whole budget has been started
+ADAPTIVE_BATCH_DIVISOR = 4
+
+# per-run GA checkpoints and the results of finished runs (campaign.json) of run_ga_optimizations_in_process
+DEFAULT_CHECKPOINT_DIR = 'ga_checkpoints'
+
+def _init_ga_worker(signal_df, background_dfs, n_threads):
+    from numba import set_num_threads
+    
+    global _worker_data
+    _worker_data = (signal_df, background_dfs)
+    # concurrent runs share the cores instead of each starting cpu_count numba threads
+    set_num_threads(n_threads)
+
+def _run_ga_worker(run_index, seed, checkpoint_file=None, resume=False, warm_start=None, options=None):
+    import GA
+    
+    signal_df, background_dfs = _worker_data
+    # concurrent runs must not overwrite each other's chi-squared plot
+    plot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f'chiSquared_run_{run_index+1}.png')
+    options = dict(options or {}, processes=1, checkpoint_file=checkpoint_file, resume=resume,
+                   warm_start=warm_start, plot_path=plot_path)
+    ga_results = GA.run_optimization(signal_df, background_dfs, seed=seed, verbose=False, **options)
+    
+    result = {
+        'significance': ga_results['significance'],
+        'thresholds': ga_results['thresholds'],
+        'seed': seed,
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    if 'cross_section' in ga_results:
+        result['cross_section'] = ga_results['cross_section']
+    
+    return run_index, result
+
+def load_campaign(checkpoint_dir):
+    campaign_file = os.path.join(checkpoint_dir, 'campaign.json')
+    if not os.path.exists(campaign_file):
+        return None
+    with open(campaign_file) as f:
+        campaign = json.load(f)
+    campaign['results'] = {int(run_index): result for run_index, result in campaign['results'].items()}
+    return campaign
+
+def save_campaign(checkpoint_dir, campaign):
+    campaign_file = os.path.join(checkpoint_dir, 'campaign.json')
+    tmp_file = campaign_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(campaign, f, indent=2, default=float)
+    os.replace(tmp_file, campaign_file)
+
+def metric_value(result, metric):
+    """Value of 'significance' or of a cross-section key prefixed by 'xs_' (e.g. xs_error_top) in a run result."""
+    if metric == 'significance':
+        return result['significance']
+    return result.get('cross_section', {}).get(metric[len('xs_'):])
+
+def standard_error(results_list, metric):
+    """Standard error of the mean of metric over the runs that measured it, and their number."""
+    values = [value for value in (metric_value(result, metric) for result in results_list) if value is not None]
+    if len(values) < 2:
+        return float('inf'), len(values)
+    return np.std(values, ddof=1) / np.sqrt(len(values)), len(values)
+
+def precision_reached(results_list, target_precision, metric, min_runs):
+    error, n_runs = standard_error(results_list, metric)
+    print(f"Standard error of the mean {metric} after {n_runs} runs: {error:.6f} (target {target_precision})")
+    return n_runs >= min_runs and error <= target_precision
+
+def run_ga_optimizations_in_process(num_runs, workers=None, base_seed=None, checkpoint_dir=None, resume=False,
+                                    warm_start=False, archive_file=None, target_precision=None,
+                                    metric='significance', batch_size=None, min_runs=3, ga_args=()):
+    """
+    Run the GA num_runs times inside this interpreter instead of one subprocess per run.
+    
+    The prediction tables are loaded once and handed to a pool of worker processes that
+    stay alive for all runs, so the imports, the table loading and the numba compilation
+    are paid once per worker. Each run evaluates its fitness in its worker and gets its own seed.
+    ga_args are GA.py command-line options (evaluation, engine, refinement, ...) applied to
+    every run; the seed, the checkpoints and the worker processes are set by the campaign.
+    
+    With a checkpoint_dir, every run checkpoints its islands after each migration cycle and
+    finished runs are recorded in campaign.json; resume=True skips the finished runs and
+    continues the interrupted ones from their last checkpoint, with the original seeds.
+    
+    The optimum of every finished run is appended to archive_file. With warm_start, the
+    archive of previous optima is read once before the first run and all runs start their
+    islands around it (GA.warm_start_populations).
+    
+    With a target_precision, num_runs is a budget: the runs are submitted in batches of
+    batch_size (the first one topped up to min_runs) and no further batch is started once the
+    standard error of the mean metric over at least min_runs runs is at most target_precision.
+    The pool then only has as many workers as the largest batch. Warm-started runs are not
+    independent, so target_precision cannot be combined with warm_start.
+    
+    Args:
+        num_runs (int): Number of GA runs
+        workers (int): Number of runs executed concurrently (default: number of cores)
+        base_seed (int): Run i is seeded with base_seed + i (default: random seeds)
+        checkpoint_dir (str): Directory of the run checkpoints (default: no checkpoints)
+        resume (bool): Continue the campaign checkpointed in checkpoint_dir
+        warm_start (bool): Seed the runs from the archive and optimal_thresholds.csv
+        archive_file (str): Threshold archive (default: GA.DEFAULT_ARCHIVE_FILE when warm-starting, else none)
+        target_precision (float): Stop once the standard error of the mean metric reaches it (default: run all)
+        metric (str): 'significance' or 'xs_error_top'
+        batch_size (int): Runs submitted at once in adaptive mode (default: a quarter of the workers)
+        min_runs (int): Smallest number of runs before stopping in adaptive mode
+        ga_args (list): GA.py command-line options of every run
+        
+    Returns:
+        list: Results of the successful runs, in run order
+    """
+    import GA
+    
+    print("\n=== Running Genetic Algorithm Optimizations in-process ===")
+    options = GA.ga_options(GA.parse_arguments(list(ga_args)))
+    if options['islands'] == 'processes':
+        raise ValueError("Process islands cannot run inside the campaign's worker processes")
+    
+    signal_df, background_dfs = GA.load_data()
+    
+    if warm_start and target_precision is not None:
+        raise ValueError("Warm-started runs are not independent, a target precision needs cold starts")
+    
+    archive = None
+    if warm_start:
+        archive = GA.load_threshold_archive(signal_df.columns, archive_file or GA.DEFAULT_ARCHIVE_FILE)
+        if archive is None:
+            print("No previous optima to warm-start from, starting from scratch")
+        else:
+            print(f"Warm-starting every run from {len(archive)} archived optima")
+    
+    campaign = None
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        if resume:
+            campaign = load_campaign(checkpoint_dir)
+            if campaign is None:
+                print(f"No campaign to resume in {checkpoint_dir}, starting a new one")
+            elif base_seed is not None and base_seed != campaign['base_seed']:
+                raise ValueError(f"Seed {base_seed} differs from the checkpointed campaign seed {campaign['base_seed']}")
+            else:
+                base_seed = campaign['base_seed']
+                print(f"Resuming campaign from {checkpoint_dir}: {len(campaign['results'])} runs already finished")
+    
+    if base_seed is None:
+        base_seed = random.SystemRandom().randrange(2**31)
+    seeds = [base_seed + i for i in range(num_runs)]
+    
+    if checkpoint_dir is not None and campaign is None:
+        campaign = {'base_seed': base_seed, 'results': {}}
+        save_campaign(checkpoint_dir, campaign)
+    
+    results = {i: result for i, result in (campaign['results'] if campaign else {}).items() if i < num_runs}
+    todo = [i for i in range(num_runs) if i not in results]
+    
+    workers = max(1, min(len(todo), workers or multiprocessing.cpu_count()))
+    if target_precision is None:
+        print(f"Running {len(todo)} GA runs with {workers} workers (seeds {seeds[0]}..{seeds[-1]})")
+    else:
+        batch_size = batch_size or max(1, workers // ADAPTIVE_BATCH_DIVISOR)
+        workers = min(workers, max(batch_size, min_runs - len(results)))
+        print(f"Running up to {len(todo)} GA runs in batches of {batch_size} with {workers} workers "
+              f"until the standard error of the mean {metric} is at most {target_precision}")
+    
+    def checkpoint_file(i):
+        return None if checkpoint_dir is None else os.path.join(checkpoint_dir, f'run_{i}.pkl')
+    
+    n_threads = max(1, multiprocessing.cpu_count() // workers)
+    with multiprocessing.Pool(workers, initializer=_init_ga_worker,
+                              initargs=(signal_df, background_dfs, n_threads)) as pool:
+        while todo:
+            if target_precision is None:
+                batch, todo = todo, []
+            elif precision_reached(results.values(), target_precision, metric, min_runs):
+                print(f"Target precision reached, skipping the remaining {len(todo)} runs")
+                break
+            else:
+                size = max(batch_size, min_runs - len(results))
+                batch, todo = todo[:size], todo[size:]
+            
+            pending = [pool.apply_async(_run_ga_worker, (i, seeds[i], checkpoint_file(i), resume, archive, options))
+                       for i in batch]
+            for i, async_result in zip(batch, pending):
+                try:
+                    run_index, result = async_result.get()
+                except Exception as e:
+                    print(f"Error in GA run {i+1}: {e}")
+                    continue
+                results[run_index] = result
+                print(f"GA run {run_index+1}/{num_runs} completed with significance: {result['significance']:.6f}")
+                if archive_file is not None:
+                    GA.append_to_archive(archive_file, signal_df.columns, list(result['thresholds'].values()),
+                                         result['significance'], result['seed'])
+                
+                if campaign is not None:
+                    campaign['results'][run_index] = result
+                    save_campaign(checkpoint_dir, campaign)
+                    if os.path.exists(checkpoint_file(run_index)):
+                        os.remove(checkpoint_file(run_index))
+    
+    return [results[i] for i in sorted(results)]
+
 def calculate_statistics(results_list):
     if not results_list:
         return None
@@ -94,6 +306,7 @@ def calculate_statistics(results_list):
         'significance_min': np.min(significances),
         'significance_max': np.max(significances),
         'significance_variance': np.var(significances),
+        'significance_standard_error': np.std(significances, ddof=1) / np.sqrt(len(significances)) if len(significances) > 1 else float('nan'),
         'count': len(significances)
     }
     
@@ -116,7 +329,8 @@ def calculate_statistics(results_list):
                     f'{param_prefix}std': np.std(param_values),
                     f'{param_prefix}min': np.min(param_values),
                     f'{param_prefix}max': np.max(param_values),
-                    f'{param_prefix}variance': np.var(param_values)
+                    f'{param_prefix}variance': np.var(param_values),
+                    f'{param_prefix}standard_error': np.std(param_values, ddof=1) / np.sqrt(len(param_values)) if len(param_values) > 1 else float('nan')
                 })
     
     return stats
@@ -129,6 +343,8 @@ def save_results_to_csv(results_list, stats, filename="analysisResults.csv"):
             'significance': result['significance'],
             'timestamp': result['timestamp']
         }
+        if 'seed' in result:
+            run_data['seed'] = result['seed']
         for feature, value in result['thresholds'].items():
             run_data[f'threshold_{feature}'] = value
         
@@ -157,8 +373,44 @@ def save_results_to_csv(results_list, stats, filename="analysisResults.csv"):
 
 def main():
     parser = argparse.ArgumentParser(description='Run BDTG training and GA optimization multiple times')
-    parser.add_argument('--runs', type=int, default=5, help='Number of GA optimization runs (default: 5)')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Number of GA optimization runs, the largest number with --target-precision (default: 5)')
+    parser.add_argument('--target-precision', type=float, default=None,
+                        help='Stop starting runs once the standard error of the mean --target-metric is at most '
+                             'this value (default: always run --runs)')
+    parser.add_argument('--target-metric', type=str, default='significance', choices=['significance', 'xs_error_top'],
+                        help='Quantity whose mean must reach --target-precision (default: significance)')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Runs started between two precision checks (default: a quarter of --workers, '
+                             '1 with --subprocess)')
+    parser.add_argument('--min-runs', type=int, default=3,
+                        help='Smallest number of runs before the target precision can stop the study (default: 3)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='GA runs executed concurrently in-process (default: number of cores)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Base seed, run i uses seed + i (default: random)')
+    parser.add_argument('--checkpoint-dir', type=str, default=DEFAULT_CHECKPOINT_DIR,
+                        help=f'Directory of the GA run checkpoints (default: {DEFAULT_CHECKPOINT_DIR})')
+    parser.add_argument('--no-checkpoint', action='store_true',
+                        help='Do not checkpoint the GA runs')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip the finished runs of an interrupted campaign and continue the others '
+                             'from their last checkpoint')
+    parser.add_argument('--warm-start', action='store_true',
+                        help='Start the GA runs around the previous optima of the threshold archive and optimal_thresholds.csv')
+    parser.add_argument('--archive', type=str, default='threshold_archive.csv',
+                        help='Archive of previous optima, appended to after every run (default: threshold_archive.csv)')
+    parser.add_argument('--no-archive', action='store_true',
+                        help='Do not append the optima of these runs to the archive')
+    parser.add_argument('--ga-args', type=str, default='',
+                        help='Options passed to every GA run, in GA.py syntax and attached with =, '
+                             'e.g. --ga-args="--evaluation kdtree --engine array"')
+    parser.add_argument('--subprocess', action='store_true',
+                        help='Run each GA optimization as a separate GA.py process and parse its results file')
     args = parser.parse_args()
+    if args.warm_start and args.target_precision is not None:
+        # runs warm-started from a shared archive are not independent, their spread says nothing about the precision
+        parser.error("--warm-start cannot be combined with --target-precision")
     
     num_runs = args.runs
     
@@ -169,12 +421,31 @@ def main():
         print("BDTG training failed. Exiting.")
         return
     
-    results_list = []
-    for i in range(num_runs):
-        print(f"\n--- Starting GA Run {i+1}/{num_runs} ---")
-        result = run_ga_optimization()
-        if result:
-            results_list.append(result)
+    archive_file = None if args.no_archive else args.archive
+    
+    if args.subprocess:
+        ga_args = shlex.split(args.ga_args) + ['--archive', args.archive]
+        if args.warm_start:
+            ga_args.append('--warm-start')
+        if args.no_archive:
+            ga_args.append('--no-archive')
+        results_list = []
+        for i in range(num_runs):
+            if (args.target_precision is not None and i % (args.batch_size or 1) == 0
+                    and precision_reached(results_list, args.target_precision, args.target_metric, args.min_runs)):
+                print(f"Target precision reached, skipping the remaining {num_runs - i} runs")
+                break
+            print(f"\n--- Starting GA Run {i+1}/{num_runs} ---")
+            result = run_ga_optimization(ga_args)
+            if result:
+                results_list.append(result)
+    else:
+        checkpoint_dir = None if args.no_checkpoint else args.checkpoint_dir
+        results_list = run_ga_optimizations_in_process(num_runs, args.workers, args.seed,
+                                                       checkpoint_dir, args.resume,
+                                                       args.warm_start, archive_file, args.target_precision,
+                                                       args.target_metric, args.batch_size, args.min_runs,
+                                                       shlex.split(args.ga_args))
     
     if results_list:
         stats = calculate_statistics(results_list)
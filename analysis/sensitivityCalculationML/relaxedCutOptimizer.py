@@ -0,0 +1,191 @@
+import time
+import numpy as np
+from numba import jit, prange
+
+from numba_optimization import population_significance
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+# number of (start x event x feature) terms evaluated at once
+CHUNK_ELEMENTS = 4000000
+
+# below z = -SIGMOID_CUTOFF the sigmoid (< 1e-17) is taken as 0, so the numba kernel stops at
+# the first cut an event fails by a wide margin
+SIGMOID_CUTOFF = 40.0
+
+@jit(nopython=True, parallel=True, fastmath=True, cache=True)
+def _smooth_terms_numba(events, event_weights, is_signal, thresholds, temperature):
+    """Same as _smooth_terms_numpy in one pass over the events per start, skipping events that fail a cut."""
+    n_starts, n_features = thresholds.shape
+    S = np.zeros(n_starts)
+    B = np.zeros(n_starts)
+    grad_S = np.zeros((n_starts, n_features))
+    grad_B = np.zeros((n_starts, n_features))
+
+    for p in prange(n_starts):
+        sigmoid = np.empty(n_features)
+        for e in range(events.shape[0]):
+            weighted_pass = event_weights[e]
+            for i in range(n_features):
+                z = (events[e, i] - thresholds[p, i]) / temperature
+                if z < -SIGMOID_CUTOFF:
+                    weighted_pass = 0.0
+                    break
+                sigmoid[i] = 1.0 / (1.0 + np.exp(-z))
+                weighted_pass *= sigmoid[i]
+            if weighted_pass == 0.0:
+                continue
+
+            if is_signal[e]:
+                S[p] += weighted_pass
+                for i in range(n_features):
+                    grad_S[p, i] -= weighted_pass * (1.0 - sigmoid[i]) / temperature
+            else:
+                B[p] += weighted_pass
+                for i in range(n_features):
+                    grad_B[p, i] -= weighted_pass * (1.0 - sigmoid[i]) / temperature
+
+    return S, B, grad_S, grad_B
+
+def _smooth_terms_numpy(events, event_weights, is_signal, thresholds, temperature):
+    """Smooth S and B of every start and their gradients with respect to the thresholds."""
+    n_starts, n_features = thresholds.shape
+    chunk = max(1, CHUNK_ELEMENTS // (n_starts * n_features))
+
+    S = np.zeros(n_starts)
+    B = np.zeros(n_starts)
+    grad_S = np.zeros((n_starts, n_features))
+    grad_B = np.zeros((n_starts, n_features))
+
+    for start in range(0, len(events), chunk):
+        x = events[start:start + chunk]
+        sig = is_signal[start:start + chunk]
+        z = (x[None, :, :] - thresholds[:, None, :]) / temperature
+        sigmoid = 0.5 * (1.0 + np.tanh(0.5 * z))
+        weighted_pass = np.prod(sigmoid, axis=2) * event_weights[start:start + chunk]
+        # d sigmoid(z) / d threshold = -sigmoid * (1 - sigmoid) / T, divided by sigmoid for the product
+        d_pass = -weighted_pass[:, :, None] * (1.0 - sigmoid) / temperature
+
+        S += weighted_pass[:, sig].sum(axis=1)
+        B += weighted_pass[:, ~sig].sum(axis=1)
+        grad_S += d_pass[:, sig].sum(axis=1)
+        grad_B += d_pass[:, ~sig].sum(axis=1)
+
+    return S, B, grad_S, grad_B
+
+def _smooth_terms_torch(events, event_weights, is_signal, thresholds, temperature):
+    """Same as _smooth_terms_numpy with multi-threaded PyTorch CPU kernels."""
+    n_starts, n_features = thresholds.shape
+    chunk = max(1, CHUNK_ELEMENTS // (n_starts * n_features))
+
+    t = torch.from_numpy(thresholds)
+    S = torch.zeros(n_starts, dtype=torch.float64)
+    B = torch.zeros(n_starts, dtype=torch.float64)
+    grad_S = torch.zeros((n_starts, n_features), dtype=torch.float64)
+    grad_B = torch.zeros((n_starts, n_features), dtype=torch.float64)
+
+    for start in range(0, len(events), chunk):
+        x = events[start:start + chunk]
+        sig = is_signal[start:start + chunk]
+        sigmoid = torch.sigmoid((x.unsqueeze(0) - t.unsqueeze(1)) / temperature)
+        weighted_pass = sigmoid.prod(dim=2) * event_weights[start:start + chunk]
+        d_pass = -weighted_pass.unsqueeze(2) * (1.0 - sigmoid) / temperature
+
+        S += weighted_pass[:, sig].sum(dim=1)
+        B += weighted_pass[:, ~sig].sum(dim=1)
+        grad_S += d_pass[:, sig].sum(dim=1)
+        grad_B += d_pass[:, ~sig].sum(dim=1)
+
+    return S.numpy(), B.numpy(), grad_S.numpy(), grad_B.numpy()
+
+def optimize_relaxed_cuts(table, starts, steps=300, learning_rate=0.02,
+                          initial_temperature=0.1, final_temperature=0.002,
+                          rescore_every=25, backend=None, verbose=True):
+    """
+    Gradient ascent on a smooth significance in which every cut score > t is replaced by
+    sigmoid((score - t) / T).
+
+    All starting points are optimized together with Adam while T is annealed geometrically
+    from initial_temperature to final_temperature. Every rescore_every steps the current
+    thresholds are scored with the exact (hard-cut) kernel and the best exact point seen by
+    each start is kept, so the returned significances are exact.
+
+    Args:
+        table (dict): Float table from prepare_event_table
+        starts (array): (n_starts x features) starting thresholds
+        steps (int): Gradient steps
+        learning_rate (float): Adam step size, in threshold units
+        initial_temperature (float): Sigmoid width at the first step
+        final_temperature (float): Sigmoid width at the last step
+        rescore_every (int): Steps between exact re-scorings
+        backend (str): 'torch', 'numba' or 'numpy' (default: torch when installed, numba otherwise)
+        verbose (bool): Print the progress of the best start
+
+    Returns:
+        tuple: (best thresholds of every start, their exact significances)
+    """
+    if backend is None:
+        backend = 'torch' if torch is not None else 'numba'
+    if backend == 'torch' and torch is None:
+        raise ImportError("The torch backend requires PyTorch")
+    if backend != 'torch' and verbose:
+        print(f"Warning: PyTorch not used, the relaxed-cut optimizer runs on the slower {backend} backend")
+
+    events = table['events']
+    offsets = table['offsets']
+    segment = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    event_weights = np.asarray(table['segment_weights'], dtype=np.float64)[segment]
+    is_signal = segment == 0
+
+    if backend == 'torch':
+        smooth_terms = _smooth_terms_torch
+        data = (torch.from_numpy(np.ascontiguousarray(events)), torch.from_numpy(event_weights),
+                torch.from_numpy(is_signal))
+    elif backend == 'numba':
+        smooth_terms = _smooth_terms_numba
+        data = (np.ascontiguousarray(events, dtype=np.float64), event_weights, is_signal)
+    else:
+        smooth_terms = _smooth_terms_numpy
+        data = (events, event_weights, is_signal)
+
+    thresholds = np.clip(np.array(starts, dtype=np.float64), 0.0, 1.0)
+    best_thresholds = thresholds.copy()
+    best_significances = population_significance(thresholds, table)
+
+    first_moment = np.zeros_like(thresholds)
+    second_moment = np.zeros_like(thresholds)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-12
+    start_time = time.time()
+
+    for step in range(1, steps + 1):
+        temperature = initial_temperature * (final_temperature / initial_temperature) ** ((step - 1) / max(steps - 1, 1))
+
+        S, B, grad_S, grad_B = smooth_terms(*data, thresholds, temperature)
+        total = np.maximum(S + B, 1e-300)
+        # Z = S / sqrt(S + B)
+        dZ_dS = (S + 2 * B) / (2 * total ** 1.5)
+        dZ_dB = -S / (2 * total ** 1.5)
+        gradient = dZ_dS[:, None] * grad_S + dZ_dB[:, None] * grad_B
+
+        first_moment = beta1 * first_moment + (1 - beta1) * gradient
+        second_moment = beta2 * second_moment + (1 - beta2) * gradient ** 2
+        step_direction = (first_moment / (1 - beta1 ** step)) / (np.sqrt(second_moment / (1 - beta2 ** step)) + epsilon)
+        thresholds = np.clip(thresholds + learning_rate * step_direction, 0.0, 1.0)
+
+        if step % rescore_every == 0 or step == steps:
+            exact = population_significance(thresholds, table)
+            improved = exact > best_significances
+            best_thresholds[improved] = thresholds[improved]
+            best_significances[improved] = exact[improved]
+            if verbose:
+                smooth = S / np.sqrt(total)
+                print(f"  Step {step}/{steps} (T={temperature:.4f}): best smooth significance {smooth.max():.6f}, "
+                      f"best exact {best_significances.max():.6f}")
+
+    if verbose:
+        print(f"Relaxed-cut optimization of {len(thresholds)} starts ({backend}) took {time.time() - start_time:.1f}s")
+
+    return best_thresholds, best_significances
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import GA
+from numba_optimization import DeltaEvaluator, prepare_event_table
+from cutRefinement import table_significance
+
+FEATURES = ['BDTG_Bqq', 'BDTG_Btt', 'BDTG_BZZ']
+
+def synthetic_table(n_events=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    signal_df = pd.DataFrame(rng.beta(4, 2, (n_events, len(FEATURES))), columns=FEATURES)
+    background_dfs = {name: pd.DataFrame(rng.beta(2, 4, (n_events, len(FEATURES))), columns=FEATURES)
+                      for name in ('Bqq', 'Btt', 'BZZ')}
+    return prepare_event_table(signal_df, background_dfs, GA.weights)
+
+def test_stored_states_are_capped_on_small_tables():
+    evaluator = DeltaEvaluator(synthetic_table(), memory_mb=1024, max_states=16)
+    assert evaluator.max_states == 16
+    
+    rng = np.random.default_rng(1)
+    for thresholds in rng.random((100, len(FEATURES))):
+        evaluator.evaluate(thresholds)
+    assert len(evaluator.slots) == 16
+
+def test_capped_evaluator_stays_exact():
+    table = synthetic_table()
+    evaluator = DeltaEvaluator(table, max_states=4)
+    
+    rng = np.random.default_rng(2)
+    thresholds = rng.random(len(FEATURES)) * 0.5
+    for _ in range(300):
+        thresholds = np.clip(thresholds + rng.normal(0.0, 0.05, len(FEATURES)), 0.0, 1.0)
+        assert evaluator.evaluate(thresholds) == pytest.approx(table_significance(thresholds, table), rel=1e-12)
+    assert evaluator.n_delta > 0
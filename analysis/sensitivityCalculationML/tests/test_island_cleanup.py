@@ -0,0 +1,31 @@
+import glob
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import GA
+
+FEATURES = ['BDTG_Bqq', 'BDTG_Btt', 'BDTG_BZZ']
+
+def synthetic_scores(n_events=500, seed=0):
+    rng = np.random.default_rng(seed)
+    signal_df = pd.DataFrame(rng.beta(4, 2, (n_events, len(FEATURES))), columns=FEATURES)
+    background_dfs = {name: pd.DataFrame(rng.beta(2, 4, (n_events, len(FEATURES))), columns=FEATURES)
+                      for name in ('Bqq', 'Btt', 'BZZ')}
+    return signal_df, background_dfs
+
+def failing_engine(*args, **kwargs):
+    raise RuntimeError("island crashed")
+
+def test_shared_tables_are_released_when_an_island_fails(monkeypatch):
+    monkeypatch.setitem(GA.ENGINES, 'deap', failing_engine)
+    shared_files = set(glob.glob('/dev/shm/ga_scores_*'))
+    
+    signal_df, background_dfs = synthetic_scores()
+    GA.create_deap_types()
+    with pytest.raises(RuntimeError, match="island crashed"):
+        GA.island_model(signal_df, background_dfs, n_islands=2, n_migrations=1, island_size=10,
+                        n_gen_per_migration=1, verbose=False, processes=2)
+    
+    assert set(glob.glob('/dev/shm/ga_scores_*')) == shared_files
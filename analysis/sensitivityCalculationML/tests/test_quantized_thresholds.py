@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import GA
+from numba_optimization import prepare_event_table, snap_thresholds, quantize_scores
+from cutRefinement import table_significance
+
+FEATURES = ['BDTG_Bqq', 'BDTG_Btt', 'BDTG_BZZ']
+
+def synthetic_scores(n_events=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    signal_df = pd.DataFrame(rng.beta(4, 2, (n_events, len(FEATURES))), columns=FEATURES)
+    background_dfs = {name: pd.DataFrame(rng.beta(2, 4, (n_events, len(FEATURES))), columns=FEATURES)
+                      for name in ('Bqq', 'Btt', 'BZZ')}
+    return signal_df, background_dfs
+
+@pytest.mark.parametrize('levels', [100, 255, 256, 65535])
+def test_snapped_thresholds_pass_the_quantized_events(levels):
+    rng = np.random.default_rng(1)
+    scores = np.concatenate([rng.random(50000), np.arange(levels + 1) / levels])
+    for threshold in np.concatenate([rng.random(50), [0.0, 0.5, 1.0]]):
+        quantized_pass = quantize_scores(scores, levels) > quantize_scores(np.array([threshold]), levels)[0]
+        assert np.array_equal(quantized_pass, scores > snap_thresholds([threshold], levels)[0])
+
+@pytest.mark.parametrize('options', [{'evaluation': 'bitset', 'index_resolution': 256},
+                                     {'evaluation': 'batch', 'quantize_bits': 8},
+                                     {'evaluation': 'batch', 'quantize_bits': 16}])
+def test_exported_thresholds_reproduce_the_optimized_significance(options):
+    signal_df, background_dfs = synthetic_scores()
+    GA.create_deap_types()
+    toolbox, _, _ = GA.setup_genetic_algorithm(signal_df, background_dfs, **options)
+    table = prepare_event_table(signal_df, background_dfs, GA.weights)
+
+    candidates = np.random.default_rng(2).random((200, len(FEATURES))) * 0.8
+    for thresholds, (fitness,) in zip(candidates, toolbox.evaluate_population(candidates)):
+        exported = GA.snap_to_evaluation_grid(toolbox, thresholds)
+        assert table_significance(exported, table) == pytest.approx(fitness, rel=1e-12, abs=1e-12)